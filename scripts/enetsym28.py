@@ -1,438 +1,312 @@
 import tkinter as tk
-import networkx as nx
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
-import random
 import time
+import math
+from collections import deque
+
+from enetsym_motor import (generar_red, clasificar_nodos, NetworkState, HiloSimulacion, TIPOS_ENERGIA,
+                           SUMINISTRADOR, DISTRIBUIDOR, ESTACION, COLUMNAS_ENTERAS)
+from enetsym_dibujo import (posicionar_nodos, crear_figura, SERIES, crear_vista_red, estilo_nodos, en_vista,
+                            EtiquetasRed, PanelesBarras, ESTIRAMIENTO_X)
+from enetsym_series import AlmacenSeries, GrabadorEstadisticas
+from enetsym_historial import GrabadorHistorial
+from enetsym_difusion import ServidorMetricas
+
+# Vista agregada de la red: por encima de este número de nodos dentro de la vista de ax1, las
+# estaciones se dibujan agrupadas (un círculo por grupo) en lugar de una a una
+UMBRAL_NODOS_AGREGADO = 2000
+ESTACIONES_POR_SECTOR = 50  # Estaciones sin padre consecutivas en el anillo que forman un grupo
+TAM_MAX_GRUPO = 600  # Tamaño (área) del círculo de un grupo con todas sus estaciones llenas
+
+# Límites del panel de series: margen vertical (fracción del rango de los datos) y holgura
+# a la derecha (fracción del tiempo transcurrido) que se dejan al reescalar
+MARGEN_SERIES = 0.05
+HOLGURA_SERIES = 0.25
+
+# Frames seguidos que, como mucho, se dejan sin redibujar la red y las barras por falta de presupuesto
+MAX_FRAMES_SIN_DIBUJO_COMPLETO = 10
+
+COLOR_ARISTAS_TK = '#b3b3b3'  # Negro con alpha 0.3 sobre fondo blanco, como las aristas de matplotlib
+
+
+class RedTk:
+    # Vista de la red dibujada directamente en un tk.Canvas, sin pasar por matplotlib. Las
+    # líneas de las aristas, los óvalos de los nodos y los textos de los suministradores se
+    # crean una sola vez; en cada frame sólo se cambian con itemconfig()/coords() el color y
+    # el radio de los nodos cuyo valor (redondeado a lo que se ve en pantalla) ha cambiado.
+    def __init__(self, master, xy_nodos, segmentos, limites, puntos_a_pixeles, suministradores, nombres_energia):
+        # limites: (x0, x1, y0, y1) de la vista en coordenadas de la red (los mismos que ax1)
+        self.canvas = tk.Canvas(master, bg='white', highlightthickness=0)
+        self.xy_nodos = xy_nodos
+        self.segmentos = segmentos
+        self.limites = limites
+        self.puntos_a_pixeles = puntos_a_pixeles
+        self.suministradores = suministradores
+        self.nombres_energia = nombres_energia
+        self.ancho, self.alto = 1, 1
+        self.lineas = [self.canvas.create_line(0, 0, 0, 0, fill=COLOR_ARISTAS_TK) for _ in range(len(segmentos))]
+        self.ovalos = [self.canvas.create_oval(0, 0, 0, 0, outline='') for _ in range(len(xy_nodos))]
+        self.textos = [self.canvas.create_text(0, 0, font=('Arial', 12, 'bold'), justify='center')
+                       for _ in range(len(suministradores))]
+        self.xy_pixeles = np.zeros_like(xy_nodos)
+        self.radios = np.full(len(xy_nodos), -1.0)
+        self.colores = np.full(len(xy_nodos), -1, dtype=np.int64)
+        self.claves_textos = np.full(len(suministradores), np.iinfo(np.int64).min, dtype=np.int64)
+        self.canvas.bind('<Configure>', self.redimensionar)
+
+    def a_pixeles(self, xy):
+        x0, x1, y0, y1 = self.limites
+        return np.column_stack([(xy[..., 0].ravel() - x0) / (x1 - x0) * self.ancho,
+                                (y1 - xy[..., 1].ravel()) / (y1 - y0) * self.alto]).reshape(xy.shape)
+
+    def redimensionar(self, evento):
+        # Nuevo tamaño del canvas: recolocar todos los elementos (lo único que recorre todos los nodos)
+        self.ancho, self.alto = max(evento.width, 1), max(evento.height, 1)
+        for linea, ((xa, ya), (xb, yb)) in zip(self.lineas, self.a_pixeles(self.segmentos)):
+            self.canvas.coords(linea, xa, ya, xb, yb)
+        self.xy_pixeles = self.a_pixeles(self.xy_nodos)
+        for texto, (x, y) in zip(self.textos, self.xy_pixeles[self.suministradores]):
+            self.canvas.coords(texto, x, y)
+        self.radios[:] = -1.0  # Forzar que actualizar() recoloque todos los óvalos
+
+    def actualizar(self, node_sizes, node_colors, carga_actual, carga_anterior):
+        # node_sizes es el área en puntos² de matplotlib: el radio es la mitad de su raíz
+        radios = np.round(np.sqrt(node_sizes) / 2 * self.puntos_a_pixeles, 1)
+        rgb = np.rint(np.clip(node_colors, 0, 1) * 255).astype(np.int64)
+        colores = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+        for i in np.flatnonzero(radios != self.radios):
+            x, y = self.xy_pixeles[i]
+            r = radios[i]
+            self.canvas.coords(self.ovalos[i], x - r, y - r, x + r, y + r)
+        for i in np.flatnonzero(colores != self.colores):
+            self.canvas.itemconfig(self.ovalos[i], fill=f'#{colores[i]:06x}')
+        self.radios = radios
+        self.colores = colores
+
+        # Producción de cada suministrador con su tipo de energía (verde si sube, rojo si baja)
+        produccion = carga_actual[self.suministradores]
+        claves = np.rint(produccion * 10).astype(np.int64)
+        for j in np.flatnonzero(claves != self.claves_textos):
+            color = 'green' if produccion[j] >= carga_anterior[self.suministradores[j]] else 'red'
+            self.canvas.itemconfig(self.textos[j], text=f"{self.nombres_energia[j]}\n{claves[j] / 10:.1f}", fill=color)
+        self.claves_textos = claves
+
 
 try:
-    def generar_red(num_nodos):
-        # Generamos un grafo inicial sin semilla fija
-        G = nx.barabasi_albert_graph(num_nodos, 3)
-        return G
-
-    def clasificar_nodos(G):
-        num_nodos = G.number_of_nodes()
-        degrees = dict(G.degree())
-        sorted_nodes = sorted(degrees.items(), key=lambda x: x[1], reverse=True)
-        
-        num_suministradores = max(1, int(0.05 * num_nodos))
-        num_estaciones = int(0.60 * num_nodos)
-        num_distribuidores = num_nodos - num_suministradores - num_estaciones
-        
-        # Definir tipos de energía y sus variaciones
-        tipos_energia = ['EÓLICA', 'GEOTÉRMICA', 'NUCLEAR', 'OCEÁNICA', 'HIDROELÉCTRICA', 'BIOMASA']
-        
-        # Asignar SUMINISTRADORES
-        suministradores = [node for node, deg in sorted_nodes[:num_suministradores]]
-        
-        # Asegurar que solo hay un suministrador de tipo SOLAR
-        nodo_solar = suministradores[0]
-        G.nodes[nodo_solar]['tipo'] = 'suministrador'
-        G.nodes[nodo_solar]['energy_type'] = 'SOLAR'
-        G.nodes[nodo_solar]['produccion'] = random.uniform(10, 20)
-        G.nodes[nodo_solar]['fase'] = 0  # Fase cero para sincronizar con las 06:00
-        G.nodes[nodo_solar]['carga_actual'] = 0
-        G.nodes[nodo_solar]['carga_max'] = G.nodes[nodo_solar]['produccion']
-        G.nodes[nodo_solar]['produccion_anterior'] = 0  # Para determinar si la producción sube o baja
-        
-        # Asignar tipos de energía a los demás suministradores
-        otros_suministradores = suministradores[1:]
-        tipos_asignados = random.choices(tipos_energia, k=len(otros_suministradores))
-        
-        for node, energy_type in zip(otros_suministradores, tipos_asignados):
-            G.nodes[node]['tipo'] = 'suministrador'
-            G.nodes[node]['energy_type'] = energy_type
-            G.nodes[node]['produccion'] = random.uniform(10, 20)
-            G.nodes[node]['fase'] = random.uniform(0, 2*np.pi)
-            G.nodes[node]['carga_actual'] = 0
-            G.nodes[node]['carga_max'] = G.nodes[node]['produccion']
-            G.nodes[node]['produccion_anterior'] = 0  # Para determinar si la producción sube o baja
-        
-        # Asignar ESTACIONES (60% de los nodos con grado 1)
-        estaciones = [node for node, deg in degrees.items() if deg == 1]
-        if len(estaciones) < num_estaciones:
-            # Necesitamos convertir más nodos en estaciones
-            candidatos = [node for node in G.nodes() if node not in suministradores and degrees[node] > 1]
-            random.shuffle(candidatos)
-            while len(estaciones) < num_estaciones and candidatos:
-                nodo = candidatos.pop()
-                # Reducir su grado a 1
-                vecinos = list(G.neighbors(nodo))
-                for vecino in vecinos[1:]:
-                    G.remove_edge(nodo, vecino)
-                estaciones.append(nodo)
-                degrees[nodo] = 1
-        
-        for node in estaciones:
-            G.nodes[node]['tipo'] = 'estacion'
-            G.nodes[node]['carga_max'] = random.uniform(50, 100)
-            G.nodes[node]['carga_actual'] = 0.5 * G.nodes[node]['carga_max']
-            G.nodes[node]['fase'] = random.uniform(0, 2*np.pi)
-            G.nodes[node]['carga_anterior'] = G.nodes[node]['carga_actual']  # Para determinar si ganó o perdió carga
-        
-        # Asignar DISTRIBUIDORES al resto de nodos
-        distribuidores = [node for node in G.nodes() if 'tipo' not in G.nodes[node]]
-        for node in distribuidores:
-            G.nodes[node]['tipo'] = 'distribuidor'
-            G.nodes[node]['carga_actual'] = 0
-            G.nodes[node]['carga_max'] = random.uniform(100, 200)
-            G.nodes[node]['energia_recibida'] = 0
-            G.nodes[node]['energia_enviada'] = 0
-            G.nodes[node]['overloaded'] = False  # Indica si el distribuidor está sobrecargado
-        
-        return G
+    def actualizar_red(instantanea):
+        # Panel de la red. Del estado sólo se leen los datos estáticos (índices, cargas máximas,
+        # tipos de energía). Las aristas, los nodos y las etiquetas no se vuelven a crear: sólo se
+        # cambian tamaños, colores y los textos de las etiquetas que han cambiado
+        estaciones = estado.estaciones
+        carga_actual = instantanea.carga_actual
+        carga_relativa, node_sizes, node_colors = estilo_nodos(
+            carga_actual, estado.carga_max, estado.suministradores, estado.distribuidores, estaciones)
+        if red_tk is not None:
+            red_tk.actualizar(node_sizes, node_colors, carga_actual, instantanea.carga_anterior)
+            return
+        etiquetas_red.actualizar(carga_actual, instantanea.carga_anterior, carga_relativa)
 
-    def posicionar_nodos(G):
-        # Posicionar los nodos con los SUMINISTRADORES en el centro y las ESTACIONES en la periferia
-        suministradores = [node for node, data in G.nodes(data=True) if data['tipo'] == 'suministrador']
-        distribuidores = [node for node, data in G.nodes(data=True) if data['tipo'] == 'distribuidor']
-        estaciones = [node for node, data in G.nodes(data=True) if data['tipo'] == 'estacion']
-        
-        layers = [suministradores, distribuidores, estaciones]
-        pos = nx.shell_layout(G, nlist=layers)
-        
-        # Ajustar las posiciones para aprovechar el 95% del ancho
-        for node in pos:
-            x, y = pos[node]
-            pos[node] = (x * 1.9, y)  # Multiplicar x para ensanchar (1.9 es aproximadamente 95% del ancho)
-        return pos
-
-    def calcular_produccion(t, energy_type, produccion_base, fase):
-        if energy_type == 'EÓLICA':
-            # Energía eólica varía rápidamente
-            produccion = abs(np.sin(0.2 * t + fase)) * produccion_base
-        elif energy_type == 'SOLAR':
-            # Energía solar varía con el ciclo del día (06:00 a 18:00)
-            hora = (t % 24)
-            if 6 <= hora <= 18:
-                angulo = ((hora - 6) / 12) * np.pi  # De 0 a π
-                produccion = np.sin(angulo) * produccion_base
-            else:
-                produccion = 0
-        elif energy_type == 'GEOTÉRMICA':
-            # Energía geotérmica es estable
-            produccion = produccion_base * 0.9 + 0.1 * produccion_base * np.sin(0.05 * t + fase)
-        elif energy_type == 'NUCLEAR':
-            # Energía nuclear es muy estable
-            produccion = produccion_base
-        elif energy_type == 'OCEÁNICA':
-            # Energía oceánica varía con las mareas
-            produccion = abs(np.sin(0.05 * t + fase)) * produccion_base
-        elif energy_type == 'HIDROELÉCTRICA':
-            # Energía hidroeléctrica es relativamente estable
-            produccion = produccion_base * 0.8 + 0.2 * produccion_base * np.sin(0.05 * t + fase)
-        elif energy_type == 'BIOMASA':
-            # Biomasa es estable
-            produccion = produccion_base * 0.95 + 0.05 * produccion_base * np.sin(0.02 * t + fase)
+        # Vista detallada o agregada según cuántos nodos quedan dentro de la vista
+        agregada = np.count_nonzero(en_vista(ax1, xy_nodos)) > UMBRAL_NODOS_AGREGADO
+        if agregada != vista_agregada:
+            cambiar_vista(agregada)
+        if agregada:
+            # Suministradores y distribuidores uno a uno; estaciones, un círculo por grupo con
+            # área proporcional a su carga total y color según su estado de carga medio
+            coleccion_principales.set_sizes(node_sizes[principales])
+            coleccion_principales.set_facecolors(node_colors[principales])
+            carga_grupos = np.bincount(grupo_estacion, weights=carga_actual[estaciones], minlength=num_grupos)
+            carga_media_grupos = np.bincount(grupo_estacion, weights=carga_relativa[estaciones],
+                                             minlength=num_grupos) / estaciones_por_grupo
+            colores_grupos = np.zeros((num_grupos, 3))
+            colores_grupos[:, 2] = carga_media_grupos
+            coleccion_grupos.set_sizes(20 + TAM_MAX_GRUPO * carga_grupos / carga_max_grupos.max())
+            coleccion_grupos.set_facecolors(colores_grupos)
         else:
-            produccion = produccion_base
-        return produccion
-
-    def dibujar_red():
-        ax1.clear()
-        cargas = []
-        cargas_max = []
-        node_colors = []
-        node_sizes = []
-        labels = {}
-        for node in G.nodes():
-            tipo = G.nodes[node]['tipo']
-            if tipo == 'suministrador':
-                carga_actual = G.nodes[node]['carga_actual']
-                carga_max = G.nodes[node]['carga_max']
-                carga_relativa = carga_actual / carga_max if carga_max > 0 else 0
-                # Tamaño del nodo basado en la altura de la etiqueta (dos líneas, fuente tamaño 16)
-                # Aproximadamente 16 puntos por línea, total 32 puntos de altura
-                # Radio entre 32 y 64 puntos
-                radius = 32 + carga_relativa * (64 - 32)
-                size = radius ** 2  # node_size es proporcional al área
-                # Color entre gris (bajo) y amarillo (alto)
-                color_intensity = carga_relativa
-                color = (color_intensity, color_intensity, 0)
-                # Etiqueta de producción con tipo de energía
-                produccion_actual = G.nodes[node]['carga_actual']
-                produccion_anterior = G.nodes[node]['produccion_anterior']
-                color_texto = 'green' if produccion_actual >= produccion_anterior else 'red'
-                energy_type = G.nodes[node]['energy_type']
-                labels[node] = f"{energy_type}\n{produccion_actual:.1f}"
-                # Dibujar etiqueta con tamaño de fuente aumentado
-                nx.draw_networkx_labels(
-                    G, pos, labels={node: labels[node]},
-                    font_color=color_texto, font_size=16, font_weight='bold',
-                    ax=ax1,
-                    bbox=dict(facecolor='white', edgecolor='black', boxstyle='round,pad=0.2')
-                )
-            elif tipo == 'estacion':
-                carga_anterior = G.nodes[node]['carga_anterior']
-                carga_actual = G.nodes[node]['carga_actual']
-                carga_max = G.nodes[node]['carga_max']
-                carga_relativa = carga_actual / carga_max if carga_max > 0 else 0
-                # Color entre negro (0% carga) y azul (100% carga)
-                color_intensity = carga_relativa
-                color = (0, 0, color_intensity)
-                size = 100 + 200 * carga_relativa  # Tamaño depende de la carga
-                cargas.append(carga_actual)
-                cargas_max.append(carga_max)
-                # Etiqueta de carga
-                delta_carga = carga_actual - carga_anterior
-                color_texto = 'green' if delta_carga >= 0 else 'red'
-                labels[node] = f"{carga_actual:.1f}"
-                # Dibujar etiqueta con negrita y borde
-                nx.draw_networkx_labels(
-                    G, pos, labels={node: labels[node]},
-                    font_color=color_texto, font_size=8, font_weight='bold',
-                    ax=ax1,
-                    bbox=dict(facecolor='white', edgecolor='black', boxstyle='round,pad=0.2')
-                )
-            elif tipo == 'distribuidor':
-                carga_actual = G.nodes[node]['carga_actual']
-                carga_max = G.nodes[node]['carga_max']
-                carga_relativa = carga_actual / carga_max if carga_max > 0 else 0
-                # Tamaño depende de la carga
-                size = (100 + 200 * carga_relativa) * 3
-                # Color que varía de gris a naranja vivo
-                color_low = (0.5, 0.5, 0.5)  # Gris
-                color_high = (1.0, 0.4, 0.0)  # Naranja vivo
-                color = tuple(color_low[i] + carga_relativa * (color_high[i] - color_low[i]) for i in range(3))
-                # Etiqueta de porcentaje de carga con símbolo %
-                porcentaje_carga = (carga_actual / carga_max) * 100 if carga_max > 0 else 0
-                labels[node] = f"{porcentaje_carga:.1f}%"
-                # Dibujar etiqueta con negrita y borde
-                nx.draw_networkx_labels(
-                    G, pos, labels={node: labels[node]},
-                    font_color='black', font_size=8, font_weight='bold',
-                    ax=ax1,
-                    bbox=dict(facecolor='white', edgecolor='black', boxstyle='round,pad=0.2')
-                )
-            else:
-                color = 'gray'
-                size = 100
-            node_colors.append(color)
-            node_sizes.append(size)
-        
-        nx.draw_networkx_edges(G, pos, ax=ax1, alpha=0.3, width=0.5)
-        nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=node_sizes, ax=ax1)
-        ax1.set_axis_off()
-        
-        # Actualizar estadísticas
-        num_estaciones = len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'estacion'])
-        estaciones_carga_cero = len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'estacion' and G.nodes[n]['carga_actual'] <= 0])
-        estaciones_carga_max = len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'estacion' and G.nodes[n]['carga_actual'] >= G.nodes[n]['carga_max']])
-        carga_media_estaciones = sum([G.nodes[n]['carga_actual'] for n in G.nodes() if G.nodes[n]['tipo'] == 'estacion']) / num_estaciones
-        produccion_media_suministradores = sum([G.nodes[n]['carga_actual'] for n in G.nodes() if G.nodes[n]['tipo'] == 'suministrador']) / len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'suministrador'])
-        distribuidores_sobrecargados = len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'distribuidor' and G.nodes[n]['overloaded']])
-        
-        # Calcular nuevas estadísticas
-        total_energia_acumulada = sum([G.nodes[n]['carga_actual'] for n in G.nodes()])
-        total_carga_actual = sum([G.nodes[n]['carga_actual'] for n in G.nodes()])
-        total_carga_max = sum([G.nodes[n]['carga_max'] for n in G.nodes()])
-        porcentaje_total_carga = (total_carga_actual / total_carga_max) * 100 if total_carga_max > 0 else 0
-        porcentaje_carga_libre = ((total_carga_max - total_carga_actual) / total_carga_max) * 100 if total_carga_max > 0 else 0
-        
-        # Nueva estadística: capacidad de carga libre de las estaciones
-        capacidad_libre_estaciones = sum([G.nodes[n]['carga_max'] - G.nodes[n]['carga_actual'] for n in G.nodes() if G.nodes[n]['tipo'] == 'estacion'])
-
-        # Actualizar series de tiempo
-        tiempos.append(t)
-        serie_estaciones_cero.append(estaciones_carga_cero)
-        serie_estaciones_max.append(estaciones_carga_max)
-        serie_carga_media_estaciones.append(carga_media_estaciones)
-        serie_produccion_media_suministradores.append(produccion_media_suministradores)
-        serie_distribuidores_sobrecargados.append(distribuidores_sobrecargados)
-        serie_total_energia_acumulada.append(total_energia_acumulada)
-        serie_porcentaje_total_carga.append(porcentaje_total_carga)
-        serie_porcentaje_carga_libre.append(porcentaje_carga_libre)
-        
-        # Dibujar las series en el gráfico inferior
-        ax2.clear()
-        ax2_right.clear()
-        ax2.set_facecolor('none')
-        ax2_right.set_facecolor('none')
-        
-        ax2.plot(tiempos, serie_estaciones_cero, color='green', label='Estaciones al 0%')
-        ax2.plot(tiempos, serie_estaciones_max, color='blue', label='Estaciones al 100%')
-        ax2.plot(tiempos, serie_carga_media_estaciones, color='orange', label='Carga media estaciones')
-        ax2.plot(tiempos, serie_produccion_media_suministradores, color='purple', label='Producción media suministradores')
-        ax2.plot(tiempos, serie_distribuidores_sobrecargados, color='red', label='Distribuidores sobrecargados')
-        ax2.plot(tiempos, serie_porcentaje_total_carga, color='cyan', label='Porcentaje total de carga')
-        # Nueva serie de porcentaje de carga libre
-        ax2.plot(tiempos, serie_porcentaje_carga_libre, color='black', linestyle='dotted', linewidth=2, label='Porcentaje carga libre')
-        
-        # Nueva serie en el eje Y derecho
-        ax2_right.plot(tiempos, serie_total_energia_acumulada, color='magenta', label='Total energía acumulada')
-        
-        # Mostrar el último valor de cada serie sobre el último punto
-        if tiempos:
-            last_time = tiempos[-1]
-            ax2.text(last_time, serie_estaciones_cero[-1], f'{serie_estaciones_cero[-1]}', color='green')
-            ax2.text(last_time, serie_estaciones_max[-1], f'{serie_estaciones_max[-1]}', color='blue')
-            ax2.text(last_time, serie_carga_media_estaciones[-1], f'{serie_carga_media_estaciones[-1]:.2f}', color='orange')
-            ax2.text(last_time, serie_produccion_media_suministradores[-1], f'{serie_produccion_media_suministradores[-1]:.2f}', color='purple')
-            ax2.text(last_time, serie_distribuidores_sobrecargados[-1], f'{serie_distribuidores_sobrecargados[-1]}', color='red')
-            ax2.text(last_time, serie_porcentaje_total_carga[-1], f'{serie_porcentaje_total_carga[-1]:.1f}%', color='cyan')
-            ax2.text(last_time, serie_porcentaje_carga_libre[-1], f'{serie_porcentaje_carga_libre[-1]:.1f}%', color='black')
-            ax2_right.text(last_time, serie_total_energia_acumulada[-1], f'{serie_total_energia_acumulada[-1]:.1f}', color='magenta')
-        
-        # Leyendas y etiquetas
-        ax2.set_xlabel('Tiempo')
-        ax2.set_ylabel('Valores')
-        ax2_right.set_ylabel('Energía Acumulada')
-        ax2.legend(loc='upper left')
-        ax2_right.legend(loc='upper right')
-        
-        ax2.grid(True)
-        
-        # Ajustar límites del gráfico
-        ax2.relim()
-        ax2.autoscale_view()
-        ax2_right.relim()
-        ax2_right.autoscale_view()
-        
-        # Ajustar márgenes y espacios
-        plt.subplots_adjust(left=0.15, right=0.85, top=0.95, bottom=0.05, hspace=0.1)
-        
-        # Actualizar los dibujos
-        canvas.draw()
+            coleccion_nodos.set_sizes(node_sizes)
+            coleccion_nodos.set_facecolors(node_colors)
+
+    def agrupar_estaciones(indice):
+        # Grupo de cada estación en la vista agregada: el distribuidor o suministrador del que
+        # cuelga (tras clasificar_nodos() las estaciones tienen como mucho un vecino) o, si no
+        # cuelga de ninguno, su sector de ESTACIONES_POR_SECTOR estaciones consecutivas del anillo.
+        # Devuelve el grupo de cada estación y el nodo padre de cada grupo (-1 si es un sector).
+        num_nodos = len(indice.nodos)
+        padre = np.full(len(indice.estaciones), -1)
+        for tipo in (SUMINISTRADOR, DISTRIBUIDOR):
+            origen, destino = indice.aristas_entre(ESTACION, tipo)
+            padre[indice.fila[origen]] = destino
+        sector = np.arange(len(indice.estaciones)) // ESTACIONES_POR_SECTOR
+        claves, grupo = np.unique(np.where(padre >= 0, padre, num_nodos + sector), return_inverse=True)
+        return grupo, np.where(claves < num_nodos, claves, -1)
+
+    def cambiar_vista(agregada):
+        # Alternar entre la vista detallada y la agregada: colecciones visibles y aristas del fondo
+        global vista_agregada
+        vista_agregada = agregada
+        coleccion_nodos.set_visible(not agregada)
+        coleccion_principales.set_visible(agregada)
+        coleccion_grupos.set_visible(agregada)
+        capa_aristas.invalidar(segmentos_agregados if agregada else segmentos_aristas)
+
+    def dibujar_red(instantanea):
+        # Dibuja una instantánea publicada por el hilo de simulación. Los paneles se actualizan
+        # y se marcan como sucios; redibujar() los pinta todos con un único dibujo al final.
+        # Presupuesto por frame: si el último dibujo completo tardó más que un frame, la red y las
+        # barras sólo se actualizan uno de cada ceil(coste / presupuesto) frames (como mucho
+        # MAX_FRAMES_SIN_DIBUJO_COMPLETO) y en los demás sólo se redibujan las series con blit.
+        global frames_sin_dibujo_completo
+        estadisticas = instantanea.estadisticas
+
+        # Actualizar series de tiempo con todos los ticks simulados desde el frame anterior
+        # (contándolos al sacarlos: el hilo de simulación puede añadir más mientras tanto)
+        num_nuevos = 0
+        while estadisticas_pendientes:
+            estadisticas_tick = estadisticas_pendientes.popleft()
+            num_nuevos += 1
+            almacen_series.anadir_fila(estadisticas_tick)
+            if grabador_estadisticas is not None:
+                grabador_estadisticas.anadir(estadisticas_tick)
+        
+        # Pasar las series al gráfico inferior; si se han reescalado los ejes cambian sus ticks
+        # y hace falta un dibujo completo
+        if actualizar_series(num_nuevos):
+            paneles_sucios.add('ejes_series')
+        paneles_sucios.add('series')
+
+        # Con la vista de la red en el tk.Canvas, la red se actualiza en cada frame sin
+        # necesitar un dibujo de matplotlib
+        if red_tk is not None:
+            actualizar_red(instantanea)
+
+        # La red (de matplotlib) y las barras se actualizan si les toca según el presupuesto,
+        # o si el frame va a necesitar un dibujo completo de todos modos
+        frames_sin_dibujo_completo += 1
+        frames_por_dibujo_completo = min(math.ceil(coste_dibujo_completo / presupuesto_frame),
+                                         MAX_FRAMES_SIN_DIBUJO_COMPLETO)
+        if 'ejes_series' in paneles_sucios or frames_sin_dibujo_completo >= frames_por_dibujo_completo:
+            if red_tk is None:
+                actualizar_red(instantanea)
+                paneles_sucios.add('red')
+            paneles_barras.actualizar(estadisticas)
+            paneles_sucios.update(('carga', 'mix'))
         
         # Actualizar el tiempo en la etiqueta
         elapsed_time = time.time() - start_time
         
         # Contar los nodos de cada tipo
-        num_suministradores = len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'suministrador'])
-        num_distribuidores = len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'distribuidor'])
-        num_estaciones = len([n for n in G.nodes() if G.nodes[n]['tipo'] == 'estacion'])
+        num_suministradores = len(estado.suministradores)
+        num_distribuidores = len(estado.distribuidores)
+        num_estaciones = len(estado.estaciones)
         
-        time_label.config(text=f"Unidad de tiempo: {t}\nTiempo transcurrido: {elapsed_time:.2f} s\nNodos: {G.number_of_nodes()}\nSuministradores: {num_suministradores}\nDistribuidores: {num_distribuidores}\nEstaciones: {num_estaciones}")
+        time_label.config(text=f"Unidad de tiempo: {instantanea.t}\nTiempo transcurrido: {elapsed_time:.2f} s\nNodos: {len(estado.nodos)}\nSuministradores: {num_suministradores}\nDistribuidores: {num_distribuidores}\nEstaciones: {num_estaciones}")
         
         # Calcular la hora del día usando t
-        hora_del_dia = t % 24
+        hora_del_dia = estadisticas['hora_del_dia']
         hora_del_dia_formato = f"Hora: {int(hora_del_dia):02d}:{int((hora_del_dia % 1)*60):02d}"
         # Actualizar la etiqueta de la hora
         time_of_day_label.config(text=hora_del_dia_formato)
-        
-        # -------------------
-        # Gráfico de barras a la derecha: Carga total actual de distribuidores y estaciones, más la capacidad de carga libre
-        ax3.clear()
-        total_carga_distribuidores = sum([G.nodes[n]['carga_actual'] for n in G.nodes() if G.nodes[n]['tipo'] == 'distribuidor'])
-        total_carga_estaciones = sum([G.nodes[n]['carga_actual'] for n in G.nodes() if G.nodes[n]['tipo'] == 'estacion'])
-        
-        labels_derecha = ['Distribuidores', 'Estaciones', 'Capacidad libre estaciones']
-        valores_derecha = [total_carga_distribuidores, total_carga_estaciones, capacidad_libre_estaciones]
-        colores_derecha = ['orange', 'blue', 'green']
-        
-        ax3.bar(labels_derecha, valores_derecha, color=colores_derecha, width=0.5)  # Ancho de barra reducido
-        ax3.set_title('Carga Total Actual y Capacidad Libre')
-        ax3.set_ylabel('Energía')
-        ax3.set_xticks(range(len(labels_derecha)))
-        ax3.set_xticklabels(labels_derecha, rotation=45, ha='right')
-        
-        # Gráfico de barras a la izquierda: Mix energético
-        ax4.clear()
-        tipos_suministradores = list(set([G.nodes[n]['energy_type'] for n in G.nodes() if G.nodes[n]['tipo'] == 'suministrador']))
-        produccion_por_tipo = {}
-        for tipo in tipos_suministradores:
-            produccion_por_tipo[tipo] = sum([G.nodes[n]['carga_actual'] for n in G.nodes() if G.nodes[n]['tipo'] == 'suministrador' and G.nodes[n]['energy_type'] == tipo])
-        
-        labels_izquierda = list(produccion_por_tipo.keys())
-        valores_izquierda = list(produccion_por_tipo.values())
-        colores_izquierda = ['green', 'brown', 'gray', 'blue', 'cyan', 'orange']  # Colores relacionados con tipos de energía
-        
-        ax4.bar(labels_izquierda, valores_izquierda, color=colores_izquierda)
-        ax4.set_title('Mix Energético')
-        ax4.set_ylabel('Producción')
-        ax4.set_xticks(range(len(labels_izquierda)))
-        ax4.set_xticklabels(labels_izquierda, rotation=45, ha='right')
-        
-        # Actualizar los dibujos nuevamente
-        canvas.draw()
 
-    def actualizar():
-        global t
-        t += 1  # Avanza 1 unidad de tiempo en cada iteración
-        
-        # Reiniciar energía recibida y enviada en distribuidores
-        for node in G.nodes():
-            if G.nodes[node]['tipo'] == 'distribuidor':
-                G.nodes[node]['energia_recibida'] = 0
-                G.nodes[node]['energia_enviada'] = 0
-                # Si estaba sobrecargado, restablecer
-                if G.nodes[node]['overloaded']:
-                    G.nodes[node]['overloaded'] = False
-                    G.nodes[node]['carga_actual'] = 0
-        
-        # SUMINISTRADORES generan energía
-        for node in G.nodes():
-            if G.nodes[node]['tipo'] == 'suministrador':
-                G.nodes[node]['produccion_anterior'] = G.nodes[node]['carga_actual']
-                produccion_base = G.nodes[node]['produccion']
-                fase = G.nodes[node]['fase']
-                energy_type = G.nodes[node]['energy_type']
-                produccion = calcular_produccion(t, energy_type, produccion_base, fase)
-                G.nodes[node]['carga_actual'] = produccion  # Actualizar carga actual
-                vecinos = list(G.neighbors(node))
-                if vecinos:
-                    carga_por_vecino = produccion / len(vecinos)
-                    for vecino in vecinos:
-                        if G.nodes[vecino]['tipo'] == 'distribuidor':
-                            G.nodes[vecino]['energia_recibida'] += carga_por_vecino
-        
-        # DISTRIBUIDORES reciben y envían energía
-        for node in G.nodes():
-            if G.nodes[node]['tipo'] == 'distribuidor' and not G.nodes[node]['overloaded']:
-                # Recibir energía de suministradores y estaciones
-                energia_recibida = G.nodes[node]['energia_recibida']
-                vecinos = list(G.neighbors(node))
-                estaciones_vecinas = [n for n in vecinos if G.nodes[n]['tipo'] == 'estacion']
-                for estacion in estaciones_vecinas:
-                    if G.nodes[estacion]['carga_actual'] >= G.nodes[estacion]['carga_max']:
-                        # Absorber energía de la estación
-                        delta = min(5, G.nodes[estacion]['carga_actual'])
-                        G.nodes[estacion]['carga_anterior'] = G.nodes[estacion]['carga_actual']
-                        G.nodes[estacion]['carga_actual'] -= delta
-                        energia_recibida += delta
-                G.nodes[node]['carga_actual'] += energia_recibida
-                
-                # Verificar si excede su carga máxima
-                if G.nodes[node]['carga_actual'] >= G.nodes[node]['carga_max']:
-                    G.nodes[node]['overloaded'] = True  # Marcar como sobrecargado
-                    G.nodes[node]['carga_actual'] = G.nodes[node]['carga_max']
-                else:
-                    # Enviar energía a estaciones que no están al 100%
-                    energia_disponible = G.nodes[node]['carga_actual']
-                    estaciones_para_enviar = [n for n in estaciones_vecinas if G.nodes[n]['carga_actual'] < G.nodes[n]['carga_max']]
-                    if estaciones_para_enviar:
-                        carga_por_estacion = energia_disponible / len(estaciones_para_enviar)
-                        for estacion in estaciones_para_enviar:
-                            G.nodes[estacion]['carga_anterior'] = G.nodes[estacion]['carga_actual']
-                            G.nodes[estacion]['carga_actual'] += carga_por_estacion
-                            G.nodes[node]['energia_enviada'] += carga_por_estacion
-                            if G.nodes[estacion]['carga_actual'] > G.nodes[estacion]['carga_max']:
-                                G.nodes[estacion]['carga_actual'] = G.nodes[estacion]['carga_max']
-                        G.nodes[node]['carga_actual'] -= G.nodes[node]['energia_enviada']
-                        if G.nodes[node]['carga_actual'] < 0:
-                            G.nodes[node]['carga_actual'] = 0
-        
-        # ESTACIONES consumen o producen energía
-        for node in G.nodes():
-            if G.nodes[node]['tipo'] == 'estacion':
-                G.nodes[node]['carga_anterior'] = G.nodes[node]['carga_actual']
-                fase = G.nodes[node]['fase']
-                carga_max = G.nodes[node]['carga_max']
-                delta_carga = 0.05 * carga_max * np.sin(0.1 * t + fase)
-                delta_carga = max(-0.05 * carga_max, min(0.05 * carga_max, delta_carga))
-                G.nodes[node]['carga_actual'] += delta_carga
-                if G.nodes[node]['carga_actual'] > carga_max:
-                    G.nodes[node]['carga_actual'] = carga_max
-                elif G.nodes[node]['carga_actual'] < 0:
-                    G.nodes[node]['carga_actual'] = 0
-        
-        # Dibujar la red y actualizar estadísticas
-        dibujar_red()
-        
-        # Programar la siguiente actualización
-        root.after(int(dt * 1000), actualizar)
+        redibujar()
+
+    def redibujar():
+        # Un único redibujado por frame: draw_idle() si hay algún panel sucio que no sean las
+        # líneas de las series (la red, las barras o los ejes de las series), blit de ax2 si no
+        global inicio_dibujo_completo, frames_sin_dibujo_completo
+        if paneles_sucios - {'series'}:
+            capa_aristas.preparar()
+            inicio_dibujo_completo = time.perf_counter()
+            frames_sin_dibujo_completo = 0
+            canvas.draw_idle()
+        elif 'series' in paneles_sucios and fondo_series is not None:
+            blit_series()
+        paneles_sucios.clear()
+
+    def actualizar_series(num_nuevos):
+        # Pasa las series a sus Line2D, reducidas con min/max a unos dos puntos por píxel de ancho
+        # de ax2, y mueve los textos con el último valor. Los límites sólo
+        # se recalculan cuando un valor nuevo queda fuera de la vista; devuelve True en ese caso
+        # (cambian los ticks de los ejes y el panel necesita un canvas.draw() completo)
+        if not len(almacen_series):
+            return False
+        num_cubos = max(int(ax2.bbox.width), 1)
+        t_ultimo = almacen_series.ultimo('t')
+        for (columna, eje, estilo, formato), linea, texto in zip(series, lineas_series, textos_series):
+            linea.set_data(*almacen_series.vista(columna, num_cubos))
+            ultimo = almacen_series.ultimo(columna)
+            texto.set_position((t_ultimo, ultimo))
+            texto.set_text(formato.format(ultimo))
+            texto.set_visible(True)
+            rango = rangos_series[eje]
+            nuevos = almacen_series.ultimos(columna, num_nuevos)
+            nuevos = nuevos[~np.isnan(nuevos)]  # Ignorar NaN
+            if len(nuevos):
+                rango[0] = min(rango[0], nuevos.min())
+                rango[1] = max(rango[1], nuevos.max())
+
+        # Al reescalar se deja holgura en el lado por el que se han salido los datos,
+        # para no tener que reescalar en cada tick mientras sigan creciendo
+        fuera_de_vista = False
+        if t_ultimo > ax2.get_xlim()[1]:
+            t_primero = almacen_series.ultimos('t', len(almacen_series))[0]
+            amplitud_t = max(t_ultimo - t_primero, 1)
+            ax2.set_xlim(t_primero, t_ultimo + HOLGURA_SERIES * amplitud_t)
+            fuera_de_vista = True
+        for eje, (minimo, maximo) in rangos_series.items():
+            y0, y1 = eje.get_ylim()
+            if minimo < y0 or maximo > y1:
+                amplitud = (maximo - minimo) or 1
+                eje.set_ylim(minimo - (HOLGURA_SERIES if minimo < y0 else MARGEN_SERIES) * amplitud,
+                             maximo + (HOLGURA_SERIES if maximo > y1 else MARGEN_SERIES) * amplitud)
+                fuera_de_vista = True
+        return fuera_de_vista
+
+    def dibujar_series(evento=None):
+        # Tras cada canvas.draw() completo: guardar el fondo del panel (sin las líneas, que son
+        # artistas animados) y dibujar encima las líneas, los textos y las leyendas.
+        # Si el dibujo lo pidió redibujar() (y no, por ejemplo, un cambio de tamaño de la ventana),
+        # también mide lo que ha costado, para el presupuesto por frame.
+        global fondo_series, coste_dibujo_completo, inicio_dibujo_completo
+        if inicio_dibujo_completo is not None:
+            coste_dibujo_completo = time.perf_counter() - inicio_dibujo_completo
+            inicio_dibujo_completo = None
+        fondo_series = canvas.copy_from_bbox(ax2.bbox)
+        for artista in artistas_series:
+            artista.axes.draw_artist(artista)
+
+    def blit_series():
+        # Redibujar sólo la región de ax2 sobre el fondo guardado, sin rasterizar el resto de la figura
+        canvas.restore_region(fondo_series)
+        for artista in artistas_series:
+            artista.axes.draw_artist(artista)
+        canvas.blit(ax2.bbox)
+
+    def renderizar():
+        # Dibujar sólo la última instantánea publicada; las intermedias se descartan
+        global ultimo_t_dibujado
+        inicio_frame = time.perf_counter()
+        instantanea = hilo.ultima_instantanea
+        if instantanea.t != ultimo_t_dibujado:
+            dibujar_red(instantanea)
+            ultimo_t_dibujado = instantanea.t
+        
+        # Programar el siguiente frame sin superar fps_max
+        duracion_frame = time.perf_counter() - inicio_frame
+        root.after(max(1, int((1 / fps_max - duracion_frame) * 1000)), renderizar)
+
+    def cerrar():
+        hilo.detener()
+        if grabador_estadisticas is not None:
+            # Grabar también los ticks simulados después del último frame dibujado
+            while estadisticas_pendientes:
+                grabador_estadisticas.anadir(estadisticas_pendientes.popleft())
+            grabador_estadisticas.cerrar()
+        if grabador_historial is not None:
+            grabador_historial.cerrar()
+        if servidor_metricas is not None:
+            servidor_metricas.cerrar()
+        root.destroy()
 
     # Configuración de la ventana principal
     root = tk.Tk()
@@ -441,36 +315,105 @@ try:
 
     # Generar la red
     num_nodos = 250  # 200 nodos
+    modo_despacho = 'vectorizado'  # 'vectorizado' o 'bucle' (despacho original, para comparar)
+    renderizador_red = 'matplotlib'  # 'matplotlib' o 'tk' (vista de la red en un tk.Canvas nativo, más rápida)
     G = generar_red(num_nodos)
-    G = clasificar_nodos(G)
-    pos = posicionar_nodos(G)
-
-    # Listas para las series de tiempo
-    tiempos = []
-    serie_estaciones_cero = []
-    serie_estaciones_max = []
-    serie_carga_media_estaciones = []
-    serie_produccion_media_suministradores = []
-    serie_distribuidores_sobrecargados = []
-    serie_total_energia_acumulada = []
-    serie_porcentaje_total_carga = []
-    serie_porcentaje_carga_libre = []
-
-    # Figura de matplotlib
-    fig = plt.Figure(figsize=(10, 6))  # Aumenté el ancho de la figura
-    fig.patch.set_facecolor('white')
-
-    # Dividir la figura en varios ejes
-    ax1 = fig.add_axes([0.15, 0.35, 0.7, 0.6])  # Grafo de nodos
-    ax2 = fig.add_axes([0.15, 0.05, 0.7, 0.25], facecolor='none')  # Gráfico inferior
-    ax2_right = ax2.twinx()
-    ax3 = fig.add_axes([0.88, 0.35, 0.05, 0.6])  # Gráfico de barras a la derecha (mitad del ancho)
-    ax4 = fig.add_axes([0.02, 0.35, 0.1, 0.6])  # Gráfico de barras a la izquierda
+    G, indice = clasificar_nodos(G)
+    pos = posicionar_nodos(G, indice)
+    estado = NetworkState(G, indice, modo_despacho=modo_despacho)
+
+    # Series de tiempo: buffers circulares con los últimos ventana_series ticks
+    ventana_series = 100000  # Unas 2 horas de simulación con dt=0.08
+    almacen_series = AlmacenSeries([columna for columna, _, _, _ in SERIES], ventana_series,
+                                   {c: np.int64 for c in COLUMNAS_ENTERAS})
+    # Grabación en disco de las estadísticas de todos los ticks, un .npy por columna (None: no grabar)
+    directorio_estadisticas = None
+    grabador_estadisticas = GrabadorEstadisticas(directorio_estadisticas) if directorio_estadisticas else None
+
+    # Figura de matplotlib dividida en varios ejes
+    fig, ax1, ax2, ax2_right, ax3, ax4 = crear_figura()
+
+    # Panel de series: las líneas, los textos con el último valor y las leyendas se crean una vez
+    # como artistas animados; canvas.draw() no los rasteriza, se dibujan sobre el fondo de ax2
+    # (dibujar_series) o se redibujan solos con blit (blit_series)
+    series = [(columna, ax2_right if derecho else ax2, estilo, formato)
+              for columna, derecho, estilo, formato in SERIES]
+    lineas_series = [eje.plot([], [], animated=True, **estilo)[0] for _, eje, estilo, _ in series]
+    textos_series = [eje.text(0, 0, '', color=estilo['color'], animated=True, visible=False)
+                     for _, eje, estilo, _ in series]
+    ax2.set_xlabel('Tiempo')
+    ax2.set_ylabel('Valores')
+    ax2_right.set_ylabel('Energía Acumulada')
+    leyendas_series = [ax2.legend(loc='upper left'), ax2_right.legend(loc='upper right')]
+    ax2.grid(True)
+    # Orden de dibujo: primero todo lo de ax2 y después lo del eje derecho
+    artistas_series = []
+    for eje, leyenda in zip((ax2, ax2_right), leyendas_series):
+        leyenda.set_animated(True)
+        artistas_series += [a for a in lineas_series + textos_series if a.axes is eje] + [leyenda]
+    rangos_series = {ax2: [np.inf, -np.inf], ax2_right: [np.inf, -np.inf]}  # Mínimo y máximo de los datos
+    fondo_series = None
+
+    # Gráficos de barras: las barras se crean una vez y dibujar_red() sólo cambia sus alturas
+    paneles_barras = PanelesBarras(ax3, ax4, [TIPOS_ENERGIA[c] for c in estado.agregador.codigos_presentes])
+
+    # Vista de la red: las posiciones no cambian, así que la PathCollection de nodos y las
+    # etiquetas se crean una sola vez y dibujar_red() sólo actualiza sus arrays
+    xy_nodos = np.array([pos[node] for node in estado.nodos]).reshape(-1, 2)
+    segmentos_aristas = np.array([(pos[u], pos[v]) for u, v in G.edges()]).reshape(-1, 2, 2)
+    coleccion_nodos, capa_aristas = crear_vista_red(ax1, xy_nodos, segmentos_aristas)
+    etiquetas_red = EtiquetasRed(ax1, xy_nodos, estado.suministradores, estado.distribuidores, estado.estaciones,
+                                 [TIPOS_ENERGIA[c] for c in estado.codigo_energia[estado.suministradores]])
+
+    # Vista agregada: colecciones de suministradores y distribuidores y de grupos de estaciones.
+    # Cada grupo va en el anillo de sus estaciones (el centro de estaciones repartidas por el
+    # anillo caería dentro de los anillos interiores), en el ángulo de su nodo padre o, en los
+    # sectores sin padre, en el del centro de sus estaciones consecutivas. Sus aristas son las
+    # que no tocan estaciones más una por grupo, del nodo padre al círculo del grupo.
+    principales = np.flatnonzero(estado.tipo != ESTACION)
+    grupo_estacion, padre_grupo = agrupar_estaciones(indice)
+    num_grupos = len(padre_grupo)
+    con_padre = padre_grupo >= 0
+    estaciones_por_grupo = np.bincount(grupo_estacion, minlength=num_grupos)
+    # Coordenadas sin el estiramiento horizontal, en las que los anillos son circunferencias
+    x_estaciones = xy_nodos[estado.estaciones, 0] / ESTIRAMIENTO_X
+    y_estaciones = xy_nodos[estado.estaciones, 1]
+    radio_grupos = np.bincount(grupo_estacion, weights=np.hypot(x_estaciones, y_estaciones),
+                               minlength=num_grupos) / estaciones_por_grupo
+    angulo_grupos = np.arctan2(np.bincount(grupo_estacion, weights=y_estaciones, minlength=num_grupos),
+                               np.bincount(grupo_estacion, weights=x_estaciones, minlength=num_grupos))
+    xy_padres = xy_nodos[padre_grupo[con_padre]]
+    angulo_grupos[con_padre] = np.arctan2(xy_padres[:, 1], xy_padres[:, 0] / ESTIRAMIENTO_X)
+    xy_grupos = np.column_stack([ESTIRAMIENTO_X * radio_grupos * np.cos(angulo_grupos),
+                                 radio_grupos * np.sin(angulo_grupos)])
+    carga_max_grupos = np.bincount(grupo_estacion, weights=estado.carga_max[estado.estaciones], minlength=num_grupos)
+    extremos = np.array([(estado.posicion[u], estado.posicion[v]) for u, v in G.edges()], dtype=np.intp).reshape(-1, 2)
+    sin_estaciones = (estado.tipo[extremos] != ESTACION).all(axis=1)
+    segmentos_agregados = np.concatenate([
+        segmentos_aristas[sin_estaciones],
+        np.stack([xy_nodos[padre_grupo[con_padre]], xy_grupos[con_padre]], axis=1),
+    ])
+    coleccion_principales = ax1.scatter(xy_nodos[principales, 0], xy_nodos[principales, 1], zorder=2, visible=False)
+    coleccion_grupos = ax1.scatter(xy_grupos[:, 0], xy_grupos[:, 1], zorder=2, visible=False)
+    vista_agregada = False
 
     # Añadir el canvas de matplotlib al widget de Tkinter
     canvas = FigureCanvasTkAgg(fig, master=root)
+    canvas.mpl_connect('draw_event', dibujar_series)
+    canvas.mpl_connect('resize_event', capa_aristas.preparar)
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
 
+    # Vista de la red en un tk.Canvas colocado encima del hueco de ax1, que se oculta
+    # (matplotlib sigue dibujando las series y las barras)
+    red_tk = None
+    if renderizador_red == 'tk':
+        ax1.set_visible(False)
+        izquierda, abajo, ancho, alto = ax1.get_position().bounds
+        red_tk = RedTk(canvas.get_tk_widget(), xy_nodos, segmentos_aristas, (*ax1.get_xlim(), *ax1.get_ylim()),
+                       fig.dpi / 72, estado.suministradores,
+                       [TIPOS_ENERGIA[c] for c in estado.codigo_energia[estado.suministradores]])
+        red_tk.canvas.place(relx=izquierda, rely=1 - abajo - alto, relwidth=ancho, relheight=alto)
+
     # Etiqueta para mostrar el tiempo (alineado a la izquierda y tamaño reducido)
     time_label = tk.Label(root, text="", font=("Arial", 12), anchor='w', justify='left')
     time_label.place(x=10, y=10)
@@ -479,13 +422,44 @@ try:
     time_of_day_label = tk.Label(root, text="Hora: 00:00", font=("Arial", 24), anchor='e', justify='right')
     time_of_day_label.place(relx=1.0, x=-10, y=10, anchor='ne')
 
-    t = 0  # Tiempo inicial
-    dt = 0.08  # Intervalo de tiempo en segundos
+    dt = 0.08  # Intervalo de tiempo en segundos entre ticks de la simulación
+    fps_max = 10  # Frames por segundo máximos de la interfaz
+    presupuesto_frame = 1 / fps_max  # Segundos que puede durar el dibujo de un frame
+
+    # Planificador de redibujado: paneles pendientes de pintar ('red', 'series', 'ejes_series',
+    # 'carga', 'mix') y coste del último dibujo completo
+    paneles_sucios = set()
+    coste_dibujo_completo = 0.0
+    inicio_dibujo_completo = None
+    frames_sin_dibujo_completo = 0
+
+    # La simulación avanza en su propio hilo; las estadísticas de cada tick se acumulan
+    # hasta el siguiente frame para que las series de tiempo no pierdan ticks
+    estadisticas_pendientes = deque()
+    hilo = HiloSimulacion(estado, dt)
+    hilo.suscribir(lambda instantanea: estadisticas_pendientes.append(instantanea.estadisticas))
+    # Historial comprimido de la carga de todos los nodos cada historial_cada ticks (None: no grabar)
+    directorio_historial = None
+    historial_cada = 1
+    grabador_historial = None
+    if directorio_historial:
+        grabador_historial = GrabadorHistorial(directorio_historial, len(estado.nodos), cada=historial_cada)
+        hilo.suscribir(lambda instantanea: grabador_historial.anadir(instantanea.t, instantanea.carga_actual))
+    # Difusión de las estadísticas de cada tick a paneles externos, p. ej. 'tcp:127.0.0.1:8765' o
+    # 'unix:/tmp/enetsym.sock' (None: no difundir)
+    direccion_metricas = None
+    servidor_metricas = None
+    if direccion_metricas:
+        servidor_metricas = ServidorMetricas(direccion_metricas)
+        hilo.suscribir(lambda instantanea: servidor_metricas.publicar(instantanea.estadisticas))
+    ultimo_t_dibujado = None
+    root.protocol("WM_DELETE_WINDOW", cerrar)
 
     start_time = time.time()  # Tiempo de inicio de la simulación
 
-    # Iniciar la actualización y el dibujo
-    actualizar()
+    # Iniciar la simulación y el dibujo
+    hilo.start()
+    renderizar()
     root.mainloop()
 
 except Exception as e:
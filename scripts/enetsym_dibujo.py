@@ -0,0 +1,285 @@
+import networkx as nx
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+import numpy as np
+
+# Piezas de dibujo de la vista de la red compartidas por la interfaz (enetsym28.py) y el
+# grabador de frames (enetsym_grabacion.py). Sólo usan matplotlib, sin tkinter.
+
+# Nivel de detalle de las etiquetas: una capa se oculta entera cuando tiene más nodos que
+# este máximo dentro de la vista de ax1 (redes grandes o vista alejada)
+MAX_ETIQUETAS_ESTACIONES = 200
+MAX_ETIQUETAS_SUMINISTRADORES = 100
+MAX_ETIQUETAS_DISTRIBUIDORES = 400
+COLORES_ETIQUETA = ('red', 'green', 'black')  # Códigos de color de las etiquetas: 0, 1, 2
+
+# Límite Y de los gráficos de barras: holgura sobre la barra más alta al reescalar, y fracción
+# del límite por debajo de la cual tienen que quedar todas las barras para reducirlo
+HOLGURA_BARRAS = 0.2
+BAJAR_BARRAS = 0.5
+
+ESTIRAMIENTO_X = 1.9  # Factor por el que posicionar_nodos() ensancha los anillos (aprox. el 95% del ancho)
+
+
+# Series del gráfico inferior: (estadística, si va en el eje Y derecho, estilo de la línea,
+# formato del último valor)
+SERIES = [
+    ('estaciones_carga_cero', False, dict(color='green', label='Estaciones al 0%'), '{}'),
+    ('estaciones_carga_max', False, dict(color='blue', label='Estaciones al 100%'), '{}'),
+    ('carga_media_estaciones', False, dict(color='orange', label='Carga media estaciones'), '{:.2f}'),
+    ('produccion_media_suministradores', False, dict(color='purple', label='Producción media suministradores'), '{:.2f}'),
+    ('distribuidores_sobrecargados', False, dict(color='red', label='Distribuidores sobrecargados'), '{}'),
+    ('porcentaje_total_carga', False, dict(color='cyan', label='Porcentaje total de carga'), '{:.1f}%'),
+    ('porcentaje_carga_libre', False, dict(color='black', linestyle='dotted', linewidth=2, label='Porcentaje carga libre'), '{:.1f}%'),
+    ('total_energia_acumulada', True, dict(color='magenta', label='Total energía acumulada'), '{:.1f}'),
+]
+
+
+def en_vista(ax, xy):
+    # Máscara de los puntos xy que caen dentro de los límites actuales del eje
+    (x0, x1), (y0, y1) = sorted(ax.get_xlim()), sorted(ax.get_ylim())
+    x, y = xy[:, 0], xy[:, 1]
+    return (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+
+
+class CapaEtiquetas:
+    # Un Text reutilizable por nodo etiquetado, creado la primera vez que la etiqueta se
+    # muestra. En cada frame el valor de cada etiqueta se redondea a una décima (clave entera)
+    # y sólo se cambian el texto y el color de las etiquetas visibles cuya clave o color ha cambiado.
+    def __init__(self, ax, xy, formato, font_size, max_visibles=None):
+        # formato(j, clave) -> texto de la etiqueta j
+        self.ax = ax
+        self.xy = xy
+        self.formato = formato
+        self.font_size = font_size
+        self.max_visibles = max_visibles
+        self.textos = [None] * len(xy)
+        self.claves = np.full(len(xy), np.iinfo(np.int64).min, dtype=np.int64)
+        self.colores = np.full(len(xy), -1, dtype=np.int8)
+        self.visibles = np.zeros(len(xy), dtype=bool)
+
+    def texto(self, j):
+        if self.textos[j] is None:
+            x, y = self.xy[j]
+            self.textos[j] = self.ax.text(
+                x, y, '', size=self.font_size, weight='bold', family='sans-serif',
+                horizontalalignment='center', verticalalignment='center', clip_on=True,
+                bbox=dict(facecolor='white', edgecolor='black', boxstyle='round,pad=0.2'))
+        return self.textos[j]
+
+    def actualizar(self, valores, colores):
+        visibles = en_vista(self.ax, self.xy)
+        if self.max_visibles is not None and np.count_nonzero(visibles) > self.max_visibles:
+            visibles[:] = False
+        for j in np.flatnonzero(visibles != self.visibles):
+            self.texto(j).set_visible(visibles[j])
+        self.visibles = visibles
+
+        claves = np.rint(valores * 10).astype(np.int64)
+        for j in np.flatnonzero(visibles & (claves != self.claves)):
+            self.textos[j].set_text(self.formato(j, claves[j]))
+            self.claves[j] = claves[j]
+        for j in np.flatnonzero(visibles & (colores != self.colores)):
+            self.textos[j].set_color(COLORES_ETIQUETA[colores[j]])
+            self.colores[j] = colores[j]
+
+
+class CapaAristas:
+    # Las aristas no cambian, así que se rasterizan una sola vez a un mapa de bits del tamaño
+    # en píxeles del eje y se muestran como imagen de fondo, bajo los nodos y las etiquetas.
+    # Sólo se vuelven a rasterizar si cambia el tamaño del eje, sus límites (zoom) o las
+    # aristas mismas (invalidar()).
+    def __init__(self, ax, segmentos, **estilo):
+        self.ax = ax
+        self.segmentos = segmentos
+        self.estilo = estilo
+        (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+        self.imagen = ax.imshow(np.zeros((1, 1, 4)), extent=(x0, x1, y0, y1), aspect='auto',
+                                interpolation='nearest', zorder=1)
+        self.clave = None
+
+    def invalidar(self, segmentos=None):
+        if segmentos is not None:
+            self.segmentos = segmentos
+        self.clave = None
+
+    def preparar(self, evento=None):
+        # Rasterizar de nuevo si la vista ha cambiado desde la última vez (nada si el eje está oculto)
+        if not self.ax.get_visible():
+            return
+        figura = self.ax.figure
+        caja = self.ax.get_window_extent()
+        clave = (round(caja.width), round(caja.height), figura.dpi, self.ax.get_xlim(), self.ax.get_ylim())
+        if clave == self.clave:
+            return
+        self.clave = clave
+        ancho, alto, dpi, (x0, x1), (y0, y1) = clave
+
+        # Figura fuera de pantalla con un único eje que ocupa exactamente esos píxeles
+        figura_aristas = plt.Figure(figsize=(max(ancho, 1) / dpi, max(alto, 1) / dpi), dpi=dpi)
+        figura_aristas.patch.set_alpha(0)
+        lienzo = FigureCanvasAgg(figura_aristas)
+        eje = figura_aristas.add_axes([0, 0, 1, 1])
+        eje.set_axis_off()
+        eje.set_xlim(x0, x1)
+        eje.set_ylim(y0, y1)
+        eje.add_collection(LineCollection(self.segmentos, **self.estilo))
+        lienzo.draw()
+        self.imagen.set_data(np.asarray(lienzo.buffer_rgba()).copy())
+        self.imagen.set_extent((x0, x1, y0, y1))
+
+
+def posicionar_nodos(G, indice):
+    # Posicionar los nodos con los SUMINISTRADORES en el centro y las ESTACIONES en la periferia
+    suministradores = [indice.nodos[i] for i in indice.suministradores]
+    distribuidores = [indice.nodos[i] for i in indice.distribuidores]
+    estaciones = [indice.nodos[i] for i in indice.estaciones]
+
+    layers = [suministradores, distribuidores, estaciones]
+    pos = nx.shell_layout(G, nlist=layers)
+
+    # Ajustar las posiciones para aprovechar el 95% del ancho
+    for node in pos:
+        x, y = pos[node]
+        pos[node] = (x * ESTIRAMIENTO_X, y)  # Multiplicar x para ensanchar
+    return pos
+
+
+
+def crear_figura():
+    # Figura de la interfaz y sus ejes: red, series (con eje Y derecho) y barras a ambos lados
+    fig = plt.Figure(figsize=(10, 6))  # Aumenté el ancho de la figura
+    fig.patch.set_facecolor('white')
+    ax1 = fig.add_axes([0.15, 0.35, 0.7, 0.6])  # Grafo de nodos
+    ax2 = fig.add_axes([0.15, 0.05, 0.7, 0.25], facecolor='none')  # Gráfico inferior
+    ax2_right = ax2.twinx()
+    ax3 = fig.add_axes([0.88, 0.35, 0.05, 0.6])  # Gráfico de barras a la derecha (mitad del ancho)
+    ax4 = fig.add_axes([0.02, 0.35, 0.1, 0.6])  # Gráfico de barras a la izquierda
+    return fig, ax1, ax2, ax2_right, ax3, ax4
+
+
+def crear_vista_red(ax, xy_nodos, segmentos):
+    # Nodos (PathCollection) y capa de aristas de la vista de la red, creados una sola vez.
+    # Los límites son los que fijaba nx.draw_networkx_edges(): extremos de las aristas más un 5%.
+    coleccion_nodos = ax.scatter(xy_nodos[:, 0], xy_nodos[:, 1], s=100, zorder=2)
+    ax.set_axis_off()
+    if len(segmentos):
+        puntos = segmentos.reshape(-1, 2)
+        minimo, maximo = puntos.min(axis=0), puntos.max(axis=0)
+        relleno = 0.05 * (maximo - minimo)
+        ax.update_datalim([minimo - relleno, maximo + relleno])
+        ax.autoscale_view()
+    # Fijar los límites para que la imagen de las aristas no los modifique
+    ax.set_xlim(ax.get_xlim())
+    ax.set_ylim(ax.get_ylim())
+    capa_aristas = CapaAristas(ax, segmentos, colors='k', linewidths=0.5, alpha=0.3)
+    return coleccion_nodos, capa_aristas
+
+
+def estilo_nodos(carga_actual, carga_max, suministradores, distribuidores, estaciones):
+    # Carga relativa, tamaño (área) y color de cada nodo de la vista de la red
+    carga_relativa = np.divide(carga_actual, carga_max, out=np.zeros(len(carga_actual)), where=carga_max > 0)
+    node_colors = np.zeros((len(carga_actual), 3))
+    node_sizes = np.full(len(carga_actual), 100.0)
+
+    # SUMINISTRADORES
+    # Tamaño del nodo basado en la altura de la etiqueta (dos líneas, fuente tamaño 16)
+    # Aproximadamente 16 puntos por línea, total 32 puntos de altura
+    # Radio entre 32 y 64 puntos
+    radius = 32 + carga_relativa[suministradores] * (64 - 32)
+    node_sizes[suministradores] = radius ** 2  # node_size es proporcional al área
+    # Color entre gris (bajo) y amarillo (alto)
+    node_colors[suministradores, 0] = carga_relativa[suministradores]
+    node_colors[suministradores, 1] = carga_relativa[suministradores]
+
+    # ESTACIONES
+    # Color entre negro (0% carga) y azul (100% carga)
+    node_colors[estaciones, 2] = carga_relativa[estaciones]
+    node_sizes[estaciones] = 100 + 200 * carga_relativa[estaciones]  # Tamaño depende de la carga
+
+    # DISTRIBUIDORES
+    # Tamaño depende de la carga
+    node_sizes[distribuidores] = (100 + 200 * carga_relativa[distribuidores]) * 3
+    # Color que varía de gris a naranja vivo
+    color_low = np.array([0.5, 0.5, 0.5])  # Gris
+    color_high = np.array([1.0, 0.4, 0.0])  # Naranja vivo
+    node_colors[distribuidores] = color_low + carga_relativa[distribuidores, None] * (color_high - color_low)
+    return carga_relativa, node_sizes, node_colors
+
+
+class EtiquetasRed:
+    # Las tres capas de etiquetas de la vista de la red, en el orden de dibujo original
+    # (suministradores, estaciones, distribuidores)
+
+    def __init__(self, ax, xy_nodos, suministradores, distribuidores, estaciones, nombres_energia):
+        # nombres_energia: tipo de energía de cada suministrador, en el orden de 'suministradores'
+        self.suministradores = suministradores
+        self.distribuidores = distribuidores
+        self.estaciones = estaciones
+        self.capa_suministradores = CapaEtiquetas(
+            ax, xy_nodos[suministradores], lambda j, clave: f"{nombres_energia[j]}\n{clave / 10:.1f}", 16,
+            max_visibles=MAX_ETIQUETAS_SUMINISTRADORES)
+        self.capa_estaciones = CapaEtiquetas(
+            ax, xy_nodos[estaciones], lambda j, clave: f"{clave / 10:.1f}", 8,
+            max_visibles=MAX_ETIQUETAS_ESTACIONES)
+        self.capa_distribuidores = CapaEtiquetas(
+            ax, xy_nodos[distribuidores], lambda j, clave: f"{clave / 10:.1f}%", 8,
+            max_visibles=MAX_ETIQUETAS_DISTRIBUIDORES)
+        self.negro_distribuidores = np.full(len(distribuidores), 2, dtype=np.int8)
+
+    def actualizar(self, carga_actual, carga_anterior, carga_relativa):
+        # Etiqueta de producción con tipo de energía (verde si sube, rojo si baja)
+        suministradores = self.suministradores
+        produccion_actual = carga_actual[suministradores]
+        self.capa_suministradores.actualizar(
+            produccion_actual, (produccion_actual >= carga_anterior[suministradores]).astype(np.int8))
+        # Etiqueta de carga de las estaciones
+        estaciones = self.estaciones
+        delta_carga = carga_actual[estaciones] - carga_anterior[estaciones]
+        self.capa_estaciones.actualizar(carga_actual[estaciones], (delta_carga >= 0).astype(np.int8))
+        # Etiqueta de porcentaje de carga de los distribuidores con símbolo %
+        self.capa_distribuidores.actualizar(carga_relativa[self.distribuidores] * 100, self.negro_distribuidores)
+
+
+class PanelesBarras:
+    # Gráficos de barras de la derecha (carga total y capacidad libre) y de la izquierda (mix
+    # energético). Las barras, los títulos y las etiquetas se crean una vez con un orden fijo
+    # de categorías; en cada frame sólo cambian las alturas, y el límite Y se recalcula con
+    # histéresis: al salirse una barra por arriba o al quedar todas por debajo de BAJAR_BARRAS
+    # del límite, dejando HOLGURA_BARRAS por encima de la más alta.
+    def __init__(self, ax3, ax4, tipos_energia):
+        # tipos_energia: nombres de los tipos de energía presentes, en el orden de las barras
+        self.ax3 = ax3
+        self.ax4 = ax4
+        labels_derecha = ['Distribuidores', 'Estaciones', 'Capacidad libre estaciones']
+        colores_derecha = ['orange', 'blue', 'green']
+        self.barras_carga = ax3.bar(labels_derecha, [0] * len(labels_derecha), color=colores_derecha,
+                                    width=0.5)  # Ancho de barra reducido
+        ax3.set_title('Carga Total Actual y Capacidad Libre')
+        ax3.set_ylabel('Energía')
+        ax3.set_xticks(range(len(labels_derecha)))
+        ax3.set_xticklabels(labels_derecha, rotation=45, ha='right')
+
+        colores_izquierda = ['green', 'brown', 'gray', 'blue', 'cyan', 'orange']  # Colores relacionados con tipos de energía
+        self.tipos_energia = list(tipos_energia)
+        self.barras_mix = ax4.bar(self.tipos_energia, [0] * len(self.tipos_energia), color=colores_izquierda)
+        ax4.set_title('Mix Energético')
+        ax4.set_ylabel('Producción')
+        ax4.set_xticks(range(len(self.tipos_energia)))
+        ax4.set_xticklabels(self.tipos_energia, rotation=45, ha='right')
+
+    def actualizar(self, estadisticas):
+        produccion_por_tipo = estadisticas['produccion_por_tipo']
+        self.ajustar(self.ax3, self.barras_carga, [estadisticas['total_carga_distribuidores'],
+                                                   estadisticas['total_carga_estaciones'],
+                                                   estadisticas['capacidad_libre_estaciones']])
+        self.ajustar(self.ax4, self.barras_mix, [produccion_por_tipo.get(tipo, 0) for tipo in self.tipos_energia])
+
+    def ajustar(self, ax, barras, valores):
+        for barra, valor in zip(barras, valores):
+            barra.set_height(valor)
+        maximo = max(valores, default=0)
+        limite = ax.get_ylim()[1]
+        if maximo > limite or maximo < BAJAR_BARRAS * limite:
+            ax.set_ylim(0, maximo * (1 + HOLGURA_BARRAS) or 1)
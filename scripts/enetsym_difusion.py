@@ -0,0 +1,224 @@
+import json
+import math
+import os
+import socket
+import threading
+from collections import deque
+
+from enetsym_motor import TIPOS_ENERGIA, COLUMNAS_ESTADISTICAS, COLUMNAS_ENTERAS
+
+# Difusión local de las estadísticas de cada tick para paneles externos: JSON delimitado por
+# saltos de línea (una línea por tick, con las mismas columnas que la grabación en disco)
+# sobre un socket TCP local o Unix. Cada cliente que se conecta recibe las líneas desde ese
+# momento.
+#
+# publicar() sólo encola las estadísticas: la serialización la hace un hilo aparte, por trozos
+# de FILAS_TROZO líneas que pasa a los clientes en cuanto están listos, y el envío un hilo por
+# cliente. Cada cliente tiene como mucho MAX_COLA_CLIENTE líneas serializadas pendientes de
+# enviar; si no las lee a tiempo se descartan los trozos más antiguos, así que un cliente lento
+# nunca frena la simulación ni a los demás clientes. Si nadie está conectado no se serializa nada.
+# cerrar() termina de serializar y de enviar lo pendiente antes de cerrar las conexiones.
+
+MAX_COLA_CLIENTE = 1000  # Líneas pendientes de enviar por cliente antes de descartar las más antiguas
+MAX_COLA_ENTRADA = 100000  # Ticks pendientes de serializar antes de descartar los más antiguos
+FILAS_TROZO = 100  # Líneas que se serializan de una vez antes de pasarlas a los clientes
+TIEMPO_CIERRE = 5  # Segundos que cerrar() espera a que cada cliente reciba lo pendiente
+
+
+def fila_json(estadisticas):
+    # Línea NDJSON de un tick: columnas planas, la producción de cada tipo como produccion_<TIPO>
+    # y NaN como null (JSON estricto)
+    fila = {}
+    for c in COLUMNAS_ESTADISTICAS:
+        valor = estadisticas[c]
+        fila[c] = int(valor) if c in COLUMNAS_ENTERAS else (None if math.isnan(valor) else float(valor))
+    produccion_por_tipo = estadisticas['produccion_por_tipo']
+    for tipo in TIPOS_ENERGIA:
+        fila[f'produccion_{tipo}'] = float(produccion_por_tipo.get(tipo, 0))
+    return (json.dumps(fila, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def filas_muestras(muestras):
+    # Diccionarios por muestra (como los de calcular_estadisticas()) de un NetworkState.step()
+    produccion = muestras['produccion_por_tipo']
+    for i in range(len(muestras['t'])):
+        fila = {c: muestras[c][i] for c in COLUMNAS_ESTADISTICAS}
+        fila['produccion_por_tipo'] = dict(zip(TIPOS_ENERGIA, produccion[i]))
+        yield fila
+
+
+class Cliente:
+    # Un suscriptor conectado: su cola acotada de trozos serializados y el hilo que se los envía
+    def __init__(self, conexion, servidor):
+        self.conexion = conexion
+        self.max_lineas = servidor.max_cola_cliente
+        self.cola = deque()  # (bytes, número de líneas) de cada trozo pendiente
+        self.lineas_pendientes = 0
+        self.hay_datos = threading.Condition()
+        self.cerrando = False
+        self.descartadas = 0
+        self.quitar = servidor.quitar
+        self.hilo = threading.Thread(target=self.enviar, daemon=True)
+
+    def encolar(self, trozo, num_lineas):
+        with self.hay_datos:
+            self.cola.append((trozo, num_lineas))
+            self.lineas_pendientes += num_lineas
+            # Descartar los trozos más antiguos que no caben (nunca el que acaba de llegar)
+            while self.lineas_pendientes > self.max_lineas and len(self.cola) > 1:
+                _, descartadas = self.cola.popleft()
+                self.lineas_pendientes -= descartadas
+                self.descartadas += descartadas
+            self.hay_datos.notify()
+
+    def enviar(self):
+        try:
+            while True:
+                with self.hay_datos:
+                    while not self.cola and not self.cerrando:
+                        self.hay_datos.wait()
+                    if not self.cola:
+                        return  # Cerrando y sin nada pendiente
+                    datos = b''.join(trozo for trozo, _ in self.cola)
+                    self.cola.clear()
+                    self.lineas_pendientes = 0
+                self.conexion.sendall(datos)
+        except OSError:
+            pass  # El cliente se ha desconectado
+        finally:
+            self.quitar(self)
+            self.conexion.close()
+
+    def cerrar(self, tiempo):
+        # Enviar lo pendiente (esperando como mucho 'tiempo' segundos) y cerrar la conexión
+        with self.hay_datos:
+            self.cerrando = True
+            self.hay_datos.notify()
+        self.hilo.join(tiempo)
+        if self.hilo.is_alive():
+            try:
+                self.conexion.shutdown(socket.SHUT_RDWR)  # Desbloquear el sendall() de un cliente que no lee
+            except OSError:
+                pass
+            self.hilo.join()
+
+
+class ServidorMetricas:
+    # direccion: 'tcp:<host>:<puerto>' o 'unix:<ruta del socket>'
+    def __init__(self, direccion, max_cola_cliente=MAX_COLA_CLIENTE, max_cola_entrada=MAX_COLA_ENTRADA):
+        self.max_cola_cliente = max_cola_cliente
+        self.max_cola_entrada = max_cola_entrada
+        self.entrada = deque()  # (es_bloque, datos, número de filas) pendientes de serializar
+        self.filas_entrada = 0
+        self.descartadas_entrada = 0
+        self.hay_entrada = threading.Condition()
+        self.clientes = []
+        self.cerrojo_clientes = threading.Lock()
+        self.detenido = False
+        self.ruta_unix = None
+
+        protocolo, _, destino = direccion.partition(':')
+        if protocolo == 'unix':
+            if os.path.exists(destino):
+                os.remove(destino)  # Socket de una ejecución anterior
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.bind(destino)
+            self.ruta_unix = destino
+        elif protocolo == 'tcp':
+            host, _, puerto = destino.rpartition(':')
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.socket.bind((host or '127.0.0.1', int(puerto)))
+        else:
+            raise ValueError(f"Dirección no válida: {direccion} (se espera tcp:<host>:<puerto> o unix:<ruta>)")
+        self.socket.listen()
+        self.direccion = self.socket.getsockname()
+
+        self.hilo_aceptar = threading.Thread(target=self.aceptar, daemon=True)
+        self.hilo_serializar = threading.Thread(target=self.serializar, daemon=True)
+        self.hilo_aceptar.start()
+        self.hilo_serializar.start()
+
+    def publicar(self, estadisticas):
+        # Llamada desde el hilo de la simulación: sólo encola, sin serializar ni enviar
+        self.encolar_entrada(False, estadisticas, 1)
+
+    def publicar_muestras(self, muestras):
+        # Las filas de un NetworkState.step() (un array por estadística), que se separan en una
+        # línea por muestra al serializar
+        self.encolar_entrada(True, muestras, len(muestras['t']))
+
+    def encolar_entrada(self, es_bloque, datos, num_filas):
+        with self.hay_entrada:
+            self.entrada.append((es_bloque, datos, num_filas))
+            self.filas_entrada += num_filas
+            # Si la serialización no da abasto, descartar lo más antiguo (nunca lo que acaba de llegar)
+            while self.filas_entrada > self.max_cola_entrada and len(self.entrada) > 1:
+                _, _, descartadas = self.entrada.popleft()
+                self.filas_entrada -= descartadas
+                self.descartadas_entrada += descartadas
+            self.hay_entrada.notify()
+
+    def serializar(self):
+        # Serializa cada tick una sola vez y pasa cada trozo de líneas a la cola de cada cliente
+        while True:
+            with self.hay_entrada:
+                while not self.entrada and not self.detenido:
+                    self.hay_entrada.wait()
+                if not self.entrada:
+                    return  # Detenido y sin nada pendiente
+                pendientes = list(self.entrada)
+                self.entrada.clear()
+                self.filas_entrada = 0
+            filas = []
+            for es_bloque, datos, _ in pendientes:
+                if not self.clientes:
+                    continue  # Nadie escucha: no hace falta serializar
+                filas.extend(filas_muestras(datos) if es_bloque else [datos])
+                while len(filas) >= FILAS_TROZO:
+                    self.repartir(filas[:FILAS_TROZO])
+                    del filas[:FILAS_TROZO]
+            if filas:
+                self.repartir(filas)
+
+    def repartir(self, filas):
+        trozo = b''.join(fila_json(fila) for fila in filas)
+        with self.cerrojo_clientes:
+            clientes = list(self.clientes)
+        for cliente in clientes:
+            cliente.encolar(trozo, len(filas))
+
+    def aceptar(self):
+        while True:
+            try:
+                conexion, _ = self.socket.accept()
+            except OSError:
+                return  # Socket cerrado en cerrar()
+            cliente = Cliente(conexion, self)
+            with self.cerrojo_clientes:
+                self.clientes.append(cliente)
+            cliente.hilo.start()
+
+    def quitar(self, cliente):
+        with self.cerrojo_clientes:
+            if cliente in self.clientes:
+                self.clientes.remove(cliente)
+
+    def cerrar(self, tiempo=TIEMPO_CIERRE):
+        # Dejar de aceptar clientes, serializar lo pendiente, enviarlo y cerrar las conexiones
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)  # En Linux, close() no despierta a accept()
+        except OSError:
+            pass
+        self.socket.close()
+        self.hilo_aceptar.join()
+        with self.hay_entrada:
+            self.detenido = True
+            self.hay_entrada.notify()
+        self.hilo_serializar.join()
+        with self.cerrojo_clientes:
+            clientes = list(self.clientes)
+        for cliente in clientes:
+            cliente.cerrar(tiempo)
+        if self.ruta_unix is not None and os.path.exists(self.ruta_unix):
+            os.remove(self.ruta_unix)
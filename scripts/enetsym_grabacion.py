@@ -0,0 +1,173 @@
+import argparse
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from enetsym_motor import generar_red, clasificar_nodos, NetworkState, TIPOS_ENERGIA, COLUMNAS_ENTERAS
+from enetsym_dibujo import (posicionar_nodos, crear_figura, crear_vista_red, estilo_nodos, EtiquetasRed,
+                            PanelesBarras, SERIES)
+from enetsym_series import AlmacenSeries
+
+# Grabación de una simulación a una secuencia de PNG sin interfaz gráfica ni pantalla.
+# El proceso principal avanza la simulación a toda velocidad y entrega una instantánea cada
+# k ticks a un grupo de procesos, que dibujan la misma figura que enetsym28.py en un lienzo
+# Agg fuera de pantalla y la guardan como frame_<tick>.png.
+
+MAX_CUBOS_SERIE = 500  # Cubos min/max de cada serie que se envían por frame (unos 1000 puntos)
+VENTANA_SERIES = 100000  # Últimos ticks de las series que se dibujan, como ventana_series en enetsym28.py
+
+# Estado de cada proceso de dibujo: figura y artistas creados una sola vez en iniciar_trabajador()
+trabajador = {}
+
+
+def iniciar_trabajador(estaticos, directorio):
+    # Crea la figura del proceso con los datos estáticos de la red (posiciones, roles, cargas máximas)
+    fig, ax1, ax2, ax2_right, ax3, ax4 = crear_figura()
+    FigureCanvasAgg(fig)
+    coleccion_nodos, capa_aristas = crear_vista_red(ax1, estaticos['xy_nodos'], estaticos['segmentos'])
+    capa_aristas.preparar()
+    etiquetas_red = EtiquetasRed(ax1, estaticos['xy_nodos'], estaticos['suministradores'],
+                                 estaticos['distribuidores'], estaticos['estaciones'], estaticos['nombres_energia'])
+    paneles_barras = PanelesBarras(ax3, ax4, estaticos['tipos_energia'])
+    # Series: líneas, textos del último valor y leyendas creados una vez
+    lineas_series = []
+    textos_series = []
+    for columna, derecho, estilo, formato in SERIES:
+        eje = ax2_right if derecho else ax2
+        lineas_series.append(eje.plot([], [], **estilo)[0])
+        textos_series.append(eje.text(0, 0, '', color=estilo['color']))
+    ax2.set_xlabel('Tiempo')
+    ax2.set_ylabel('Valores')
+    ax2_right.set_ylabel('Energía Acumulada')
+    ax2.legend(loc='upper left')
+    ax2_right.legend(loc='upper right')
+    ax2.grid(True)
+    texto_tiempo = fig.text(0.01, 0.99, '', fontsize=9, va='top')
+    texto_hora = fig.text(0.99, 0.99, '', fontsize=18, ha='right', va='top')
+    trabajador.update({
+        'estaticos': estaticos, 'directorio': directorio, 'fig': fig, 'ax2': ax2, 'ax2_right': ax2_right,
+        'coleccion_nodos': coleccion_nodos, 'etiquetas_red': etiquetas_red, 'paneles_barras': paneles_barras,
+        'lineas_series': lineas_series, 'textos_series': textos_series,
+        'texto_tiempo': texto_tiempo, 'texto_hora': texto_hora,
+    })
+
+
+def dibujar_frame(instantanea, series):
+    # Dibuja una instantánea (y las series hasta su tick) y la guarda como PNG
+    w = trabajador
+    estaticos = w['estaticos']
+    carga_actual = instantanea.carga_actual
+    carga_relativa, node_sizes, node_colors = estilo_nodos(
+        carga_actual, estaticos['carga_max'], estaticos['suministradores'],
+        estaticos['distribuidores'], estaticos['estaciones'])
+    w['etiquetas_red'].actualizar(carga_actual, instantanea.carga_anterior, carga_relativa)
+    w['coleccion_nodos'].set_sizes(node_sizes)
+    w['coleccion_nodos'].set_facecolors(node_colors)
+
+    # Series de tiempo: (tiempos, valores) de cada serie, ya reducidas con min/max
+    for (columna, _, _, formato), linea, texto in zip(SERIES, w['lineas_series'], w['textos_series']):
+        tiempos, valores = series[columna]
+        linea.set_data(tiempos, valores)
+        texto.set_position((tiempos[-1], valores[-1]))
+        texto.set_text(formato.format(valores[-1]))
+    for eje in (w['ax2'], w['ax2_right']):
+        eje.relim()
+        eje.autoscale_view()
+
+    estadisticas = instantanea.estadisticas
+    w['paneles_barras'].actualizar(estadisticas)
+    hora_del_dia = estadisticas['hora_del_dia']
+    w['texto_tiempo'].set_text(f"Unidad de tiempo: {instantanea.t}\nNodos: {len(carga_actual)}")
+    w['texto_hora'].set_text(f"Hora: {int(hora_del_dia):02d}:{int((hora_del_dia % 1)*60):02d}")
+
+    ruta = os.path.join(w['directorio'], f"frame_{instantanea.t:08d}.png")
+    w['fig'].savefig(ruta)
+    return ruta
+
+
+def grabar(num_nodos, num_ticks, directorio, cada=1, procesos=None, max_pendientes=None, semilla=None,
+          ventana=VENTANA_SERIES):
+    if semilla is not None:
+        random.seed(semilla)  # generar_red() y clasificar_nodos() usan el generador global de random
+
+    # Generar la red como en la interfaz
+    G = generar_red(num_nodos)
+    G, indice = clasificar_nodos(G)
+    pos = posicionar_nodos(G, indice)
+    estado = NetworkState(G, indice)
+
+    estaticos = {
+        'xy_nodos': np.array([pos[node] for node in estado.nodos]).reshape(-1, 2),
+        'segmentos': np.array([(pos[u], pos[v]) for u, v in G.edges()]).reshape(-1, 2, 2),
+        'suministradores': estado.suministradores,
+        'distribuidores': estado.distribuidores,
+        'estaciones': estado.estaciones,
+        'carga_max': estado.carga_max,
+        'nombres_energia': [TIPOS_ENERGIA[c] for c in estado.codigo_energia[estado.suministradores]],
+        'tipos_energia': [TIPOS_ENERGIA[c] for c in estado.agregador.codigos_presentes],
+    }
+    os.makedirs(directorio, exist_ok=True)
+    procesos = procesos or os.cpu_count() or 1
+    # Frames en cola como máximo; si los procesos de dibujo no dan abasto, los frames que
+    # exceden la cola se descartan en lugar de frenar la simulación
+    max_pendientes = max_pendientes or 4 * procesos
+
+    # Series de tiempo de los últimos 'ventana' ticks: la memoria no crece con la duración de la grabación
+    columnas = [columna for columna, _, _, _ in SERIES]
+    series = AlmacenSeries(columnas, max(min(num_ticks, ventana), 1), {c: np.int64 for c in COLUMNAS_ENTERAS})
+    pendientes = set()
+    frames_enviados = 0
+    frames_descartados = 0
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=procesos, initializer=iniciar_trabajador,
+                             initargs=(estaticos, directorio)) as grupo:
+        while estado.t < num_ticks:
+            muestras = estado.step(min(cada, num_ticks - estado.t))
+            series.anadir(muestras['t'], muestras)
+            if estado.t % cada:
+                continue
+            terminados = {futuro for futuro in pendientes if futuro.done()}
+            for futuro in terminados:
+                futuro.result()  # Propagar errores de los procesos de dibujo
+            pendientes -= terminados
+            if len(pendientes) >= max_pendientes:
+                frames_descartados += 1
+                continue
+            # submit() sólo encola: el envío al proceso lo hace un hilo del ProcessPoolExecutor
+            vistas = {c: tuple(a.copy() for a in series.vista(c, MAX_CUBOS_SERIE)) for c in columnas}
+            pendientes.add(grupo.submit(dibujar_frame, estado.instantanea(), vistas))
+            frames_enviados += 1
+        tiempo_simulacion = time.time() - start_time
+        for futuro in pendientes:
+            futuro.result()
+    elapsed_time = time.time() - start_time
+    print(f"Ticks: {num_ticks}  Simulación: {tiempo_simulacion:.2f} s  Total: {elapsed_time:.2f} s  "
+          f"Frames: {frames_enviados}  Descartados: {frames_descartados}  Procesos: {procesos}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Grabación de la simulación a una secuencia de PNG")
+    parser.add_argument('--nodos', type=int, default=250, help="número de nodos de la red")
+    parser.add_argument('--ticks', type=int, required=True, help="unidades de tiempo a simular")
+    parser.add_argument('--directorio', default='frames', help="directorio de los PNG")
+    parser.add_argument('--cada', type=int, default=1, help="guardar un frame cada k ticks")
+    parser.add_argument('--procesos', type=int, default=None, help="procesos de dibujo (por defecto, uno por núcleo)")
+    parser.add_argument('--max-pendientes', type=int, default=None,
+                        help="frames en cola como máximo antes de descartar (por defecto, 4 por proceso)")
+    parser.add_argument('--semilla', type=int, default=None, help="semilla para reproducir la red")
+    parser.add_argument('--ventana', type=int, default=VENTANA_SERIES,
+                        help="últimos ticks que se muestran en las series de tiempo")
+    args = parser.parse_args()
+
+    try:
+        grabar(args.nodos, args.ticks, args.directorio, cada=args.cada, procesos=args.procesos,
+               max_pendientes=args.max_pendientes, semilla=args.semilla, ventana=args.ventana)
+    except Exception as e:
+        print("Ocurrió un error:")
+        print(e)
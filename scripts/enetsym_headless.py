@@ -0,0 +1,107 @@
+import argparse
+import csv
+import random
+import time
+
+import numpy as np
+
+from enetsym_motor import (generar_red, clasificar_nodos, generar_red_arrays, clasificar_nodos_arrays,
+                           NetworkState, TIPOS_ENERGIA, COLUMNAS_ESTADISTICAS, verificar_agregador)
+from enetsym_series import GrabadorEstadisticas
+from enetsym_historial import GrabadorHistorial
+from enetsym_difusion import ServidorMetricas
+
+# Simulación de la red sin interfaz gráfica: avanza N ticks tan rápido como permita la CPU
+# y escribe las estadísticas de dibujar_red() en un CSV. No importa tkinter ni matplotlib.
+
+TICKS_POR_BLOQUE = 10000  # Ticks que avanza cada llamada a NetworkState.step()
+
+
+def ejecutar(num_nodos, num_ticks, salida, cada=1, modo_despacho='vectorizado', semilla=None, generador='arrays',
+             directorio_columnas=None, directorio_historial=None, historial_cada=1, direccion_metricas=None,
+             verificar=False):
+    # Generar la red: con 'arrays' no se construye ningún grafo de NetworkX (redes de millones de nodos)
+    if generador == 'arrays':
+        rng = np.random.default_rng(semilla)
+        aristas = generar_red_arrays(num_nodos, 3, rng)
+        indice, atributos = clasificar_nodos_arrays(num_nodos, aristas, rng)
+        estado = NetworkState(None, indice, modo_despacho=modo_despacho, atributos=atributos)
+    else:
+        if semilla is not None:
+            random.seed(semilla)  # generar_red() y clasificar_nodos() usan el generador global de random
+        G = generar_red(num_nodos)
+        G, indice = clasificar_nodos(G)
+        estado = NetworkState(G, indice, modo_despacho=modo_despacho)
+
+    columnas = COLUMNAS_ESTADISTICAS + [f'produccion_{tipo}' for tipo in TIPOS_ENERGIA]
+    start_time = time.time()
+    grabador = GrabadorEstadisticas(directorio_columnas) if directorio_columnas else None
+    historial = GrabadorHistorial(directorio_historial, len(estado.nodos), cada=historial_cada) if directorio_historial else None
+    metricas = ServidorMetricas(direccion_metricas) if direccion_metricas else None
+    # Trabajo por tick dentro de los bloques de step(): el historial guarda la carga de los nodos
+    # (anadir() ignora los ticks que no son múltiplo de historial_cada) y --verificar compara las
+    # estadísticas incrementales con un recorrido completo de la red
+    tras_tick = None
+    if verificar:
+        def tras_tick(t, carga_actual):
+            if historial is not None:
+                historial.anadir(t, carga_actual)
+            verificar_agregador(estado)
+    elif historial is not None:
+        tras_tick = historial.anadir
+    with open(salida, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columnas)
+        # Avanzar por bloques con step() y volcar las muestras de cada bloque de una vez
+        restantes = num_ticks
+        while restantes > 0:
+            n = min(TICKS_POR_BLOQUE, restantes)
+            muestras = estado.step(n, record_every=cada, tras_tick=tras_tick)
+            valores = [muestras[c].tolist() for c in COLUMNAS_ESTADISTICAS] + muestras['produccion_por_tipo'].T.tolist()
+            writer.writerows(zip(*valores))
+            if grabador is not None:
+                grabador.anadir_muestras(muestras)
+            if metricas is not None:
+                metricas.publicar_muestras(muestras)
+            restantes -= n
+    if grabador is not None:
+        grabador.cerrar()
+    if historial is not None:
+        historial.cerrar()
+    if metricas is not None:
+        metricas.cerrar()
+    elapsed_time = time.time() - start_time
+    print(f"Ticks: {num_ticks}  Nodos: {len(estado.nodos)}  Tiempo: {elapsed_time:.2f} s  "
+          f"({num_ticks / elapsed_time if elapsed_time > 0 else float('inf'):.0f} ticks/s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulación de la red de energía sin interfaz gráfica")
+    parser.add_argument('--nodos', type=int, default=250, help="número de nodos de la red")
+    parser.add_argument('--ticks', type=int, required=True, help="unidades de tiempo a simular")
+    parser.add_argument('--salida', default='estadisticas.csv', help="fichero CSV de estadísticas")
+    parser.add_argument('--cada', type=int, default=1, help="escribir estadísticas cada k ticks")
+    parser.add_argument('--modo-despacho', default='vectorizado', choices=['vectorizado', 'bucle'])
+    parser.add_argument('--semilla', type=int, default=None, help="semilla para reproducir la red")
+    parser.add_argument('--generador', default='arrays', choices=['arrays', 'networkx'],
+                        help="generador Barabási-Albert: NumPy (por defecto) o NetworkX")
+    parser.add_argument('--columnas', default=None,
+                        help="directorio donde grabar además cada estadística en un .npy por columna")
+    parser.add_argument('--historial', default=None,
+                        help="directorio donde grabar el historial comprimido de la carga de todos los nodos")
+    parser.add_argument('--historial-cada', type=int, default=1, help="guardar la carga de los nodos cada k ticks")
+    parser.add_argument('--verificar', action='store_true',
+                        help="comprobar en cada tick las estadísticas incrementales contra un recorrido completo (lento)")
+    parser.add_argument('--metricas', default=None,
+                        help="difundir las estadísticas como NDJSON en tcp:<host>:<puerto> o unix:<ruta>")
+    args = parser.parse_args()
+
+    try:
+        ejecutar(args.nodos, args.ticks, args.salida, cada=args.cada,
+                 modo_despacho=args.modo_despacho, semilla=args.semilla, generador=args.generador,
+                 directorio_columnas=args.columnas, directorio_historial=args.historial,
+                 historial_cada=args.historial_cada, direccion_metricas=args.metricas,
+                 verificar=args.verificar)
+    except Exception as e:
+        print("Ocurrió un error:")
+        print(e)
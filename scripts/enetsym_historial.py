@@ -0,0 +1,135 @@
+import json
+import lzma
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Historial comprimido de la carga de todos los nodos, para poder revisar después la
+# trayectoria de estaciones y distribuidores concretos (por ejemplo, en una sobrecarga).
+# Cada k ticks se guarda carga_actual cuantizada a enteros (múltiplos de 'paso'). Las muestras
+# se agrupan en bloques de MUESTRAS_BLOQUE muestras x NODOS_GRUPO nodos; dentro de cada bloque
+# se guarda la primera muestra y, para las demás, la diferencia con la anterior, como int32
+# si caben (si no, int64), y el bloque se comprime por separado con zlib o lzma.
+#
+# Ficheros del directorio:
+#   meta.json   número de nodos, k, paso, tamaños de bloque y compresión
+#   datos.bin   bloques comprimidos, uno detrás de otro (sólo se añade al final)
+#   indice.bin  una fila de TIPO_INDICE por bloque (sólo se añade al final)
+# Leer "nodo X de t=a a t=b" sólo descomprime los bloques del grupo de X que cubren [a, b].
+#
+# La compresión y la escritura se hacen en un hilo aparte (zlib y lzma liberan el GIL), así
+# que en el hilo de la simulación sólo queda cuantizar cada muestra. Como mucho hay un bloque
+# comprimiéndose mientras se llena el siguiente.
+
+MUESTRAS_BLOQUE = 32
+NODOS_GRUPO = 4096
+TIPO_INDICE = np.dtype([('t_inicio', np.int64), ('num_muestras', np.int64), ('grupo', np.int64),
+                        ('desplazamiento', np.int64), ('longitud', np.int64), ('bytes_entero', np.int64)])
+COMPRESORES = {
+    'zlib': (lambda datos: zlib.compress(datos, 1), zlib.decompress),  # Nivel 1: casi la misma compresión, mucho más rápido
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+class GrabadorHistorial:
+    def __init__(self, directorio, num_nodos, cada=1, paso=0.01, compresion='zlib',
+                 muestras_bloque=MUESTRAS_BLOQUE, nodos_grupo=NODOS_GRUPO):
+        os.makedirs(directorio, exist_ok=True)
+        self.num_nodos = num_nodos
+        self.cada = cada
+        self.paso = paso
+        self.comprimir = COMPRESORES[compresion][0]
+        self.nodos_grupo = nodos_grupo
+        self.bloque = np.zeros((muestras_bloque, num_nodos), dtype=np.int64)  # Cargas cuantizadas
+        self.num_muestras = 0  # Muestras del bloque pendientes de escribir
+        self.t_inicio = None
+        with open(os.path.join(directorio, 'meta.json'), 'w') as f:
+            json.dump({'num_nodos': num_nodos, 'cada': cada, 'paso': paso, 'compresion': compresion,
+                       'muestras_bloque': muestras_bloque, 'nodos_grupo': nodos_grupo}, f)
+        self.datos = open(os.path.join(directorio, 'datos.bin'), 'wb')
+        self.indice = open(os.path.join(directorio, 'indice.bin'), 'wb')
+        self.hilo_escritura = ThreadPoolExecutor(max_workers=1)
+        self.escritura_pendiente = None
+
+    def anadir(self, t, carga_actual):
+        # Guarda la carga de los nodos en el tick t si t es múltiplo de 'cada'
+        if t % self.cada:
+            return
+        if self.num_muestras == 0:
+            self.t_inicio = t
+        np.rint(carga_actual / self.paso, out=self.bloque[self.num_muestras], casting='unsafe')
+        self.num_muestras += 1
+        if self.num_muestras == len(self.bloque):
+            self.volcar()
+
+    def volcar(self):
+        # Pasar las muestras pendientes al hilo de escritura (esperando a que termine el bloque anterior)
+        if not self.num_muestras:
+            return
+        deltas = np.diff(self.bloque[:self.num_muestras], axis=0, prepend=0)
+        if self.escritura_pendiente is not None:
+            self.escritura_pendiente.result()  # Propagar errores de la escritura anterior
+        self.escritura_pendiente = self.hilo_escritura.submit(self.escribir, self.t_inicio, deltas)
+        self.num_muestras = 0
+
+    def escribir(self, t_inicio, deltas):
+        # Comprimir un bloque de muestras, uno por grupo de nodos, y añadirlos a datos.bin e indice.bin
+        num_muestras = len(deltas)
+        filas = np.zeros(-(-self.num_nodos // self.nodos_grupo), dtype=TIPO_INDICE)
+        limite = np.iinfo(np.int32)
+        tipo = np.int32 if limite.min <= deltas.min() and deltas.max() <= limite.max else np.int64
+        for grupo, inicio in enumerate(range(0, self.num_nodos, self.nodos_grupo)):
+            comprimido = self.comprimir(deltas[:, inicio:inicio + self.nodos_grupo].astype(tipo).tobytes())
+            filas[grupo] = (t_inicio, num_muestras, grupo, self.datos.tell(), len(comprimido),
+                            np.dtype(tipo).itemsize)
+            self.datos.write(comprimido)
+        self.datos.flush()
+        self.indice.write(filas.tobytes())
+        self.indice.flush()
+
+    def cerrar(self):
+        self.volcar()
+        self.hilo_escritura.shutdown()
+        if self.escritura_pendiente is not None:
+            self.escritura_pendiente.result()
+        self.datos.close()
+        self.indice.close()
+
+
+class LectorHistorial:
+    def __init__(self, directorio):
+        with open(os.path.join(directorio, 'meta.json')) as f:
+            meta = json.load(f)
+        self.num_nodos = meta['num_nodos']
+        self.cada = meta['cada']
+        self.paso = meta['paso']
+        self.nodos_grupo = meta['nodos_grupo']
+        self.descomprimir = COMPRESORES[meta['compresion']][1]
+        self.indice = np.fromfile(os.path.join(directorio, 'indice.bin'), dtype=TIPO_INDICE)
+        self.datos = open(os.path.join(directorio, 'datos.bin'), 'rb')
+
+    def bloque(self, fila):
+        # Cargas (muestras x nodos del grupo) de una fila del índice
+        self.datos.seek(fila['desplazamiento'])
+        tipo = np.int32 if fila['bytes_entero'] == 4 else np.int64
+        deltas = np.frombuffer(self.descomprimir(self.datos.read(fila['longitud'])), dtype=tipo)
+        return np.cumsum(deltas.reshape(fila['num_muestras'], -1), axis=0, dtype=np.int64) * self.paso
+
+    def serie(self, nodo, t_inicio=0, t_fin=None):
+        # Tiempos y carga del nodo (posición en NetworkState) en las muestras con t_inicio <= t <= t_fin
+        grupo, columna = divmod(nodo, self.nodos_grupo)
+        filas = self.indice[self.indice['grupo'] == grupo]
+        t_ultimo = filas['t_inicio'] + (filas['num_muestras'] - 1) * self.cada
+        filas = filas[(t_ultimo >= t_inicio) & ((filas['t_inicio'] <= t_fin) if t_fin is not None else True)]
+        tiempos, cargas = [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+        for fila in filas:
+            t = fila['t_inicio'] + self.cada * np.arange(fila['num_muestras'])
+            dentro = (t >= t_inicio) & ((t <= t_fin) if t_fin is not None else True)
+            tiempos.append(t[dentro])
+            cargas.append(self.bloque(fila)[dentro, columna])
+        return np.concatenate(tiempos), np.concatenate(cargas)
+
+    def cerrar(self):
+        self.datos.close()
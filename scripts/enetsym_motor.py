@@ -0,0 +1,839 @@
+import networkx as nx
+import numpy as np
+import random
+import threading
+import time
+from collections import namedtuple
+from scipy import sparse
+
+# Códigos de tipo de nodo (posición en TIPOS_NODO)
+SUMINISTRADOR = 0
+DISTRIBUIDOR = 1
+ESTACION = 2
+TIPOS_NODO = ['suministrador', 'distribuidor', 'estacion']
+
+# Tipos de energía; el código de cada suministrador es su posición en esta lista
+TIPOS_ENERGIA = ['SOLAR', 'EÓLICA', 'GEOTÉRMICA', 'NUCLEAR', 'OCEÁNICA', 'HIDROELÉCTRICA', 'BIOMASA']
+SOLAR, EOLICA, GEOTERMICA, NUCLEAR, OCEANICA, HIDROELECTRICA, BIOMASA = range(len(TIPOS_ENERGIA))
+
+
+def generar_red(num_nodos):
+    # Generamos un grafo inicial sin semilla fija
+    G = nx.barabasi_albert_graph(num_nodos, 3)
+    return G
+
+
+# Nodos iniciales que generar_red_arrays() añade uno a uno: con la lista de repetidos aún corta
+# casi todos repiten destino, y es más barato muestrearlos en secuencia que con rechazo por lotes
+NODOS_SECUENCIALES = 1000
+
+
+def generar_red_arrays(num_nodos, m=3, semilla=None):
+    # Barabási-Albert con NumPy, sin construir un grafo de NetworkX. Mismo proceso que
+    # nx.barabasi_albert_graph: estrella inicial de m+1 nodos y cada nodo nuevo se une a m nodos
+    # distintos elegidos uniformemente de la lista de nodos repetidos (cada nodo aparece tantas
+    # veces como su grado). Devuelve las aristas (E, 2) en orden de creación.
+    if m < 1 or m >= num_nodos:
+        raise ValueError(f"Barabási-Albert necesita 1 <= m < num_nodos (m={m}, num_nodos={num_nodos})")
+    rng = np.random.default_rng(semilla)
+
+    # Lista de nodos repetidos completa: la estrella inicial ([0]*m + [1..m]) y, por cada nodo
+    # nuevo j, un bloque de 2m posiciones con sus m destinos seguidos de m copias de j
+    nuevos = np.arange(m + 1, num_nodos)
+    inicio = 2 * m * (nuevos - m)  # Posición del bloque de cada nodo nuevo = longitud de la lista al añadirlo
+    repetidos = np.empty(2 * m * (num_nodos - m), dtype=np.int64)
+    repetidos[:m] = 0
+    repetidos[m:2 * m] = np.arange(1, m + 1)
+    repetidos[(inicio[:, None] + m + np.arange(m)).ravel()] = np.repeat(nuevos, m)
+
+    # Primeros nodos, uno a uno
+    corte = min(len(nuevos), NODOS_SECUENCIALES)
+    for j, posicion in zip(nuevos[:corte].tolist(), inicio[:corte].tolist()):
+        destinos = []
+        while len(destinos) < m:
+            x = int(repetidos[int(rng.random() * posicion)])
+            if x not in destinos:
+                destinos.append(x)
+        repetidos[posicion:posicion + m] = destinos
+
+    # Resto de nodos a la vez: cada destino es una posición anterior de la lista, que puede ser a su
+    # vez un destino por resolver; se sigue la cadena de posiciones hasta un valor ya conocido
+    huecos = (inicio[corte:, None] + np.arange(m)).ravel()
+    longitud = np.repeat(inicio[corte:], m)
+    puntero = np.arange(len(repetidos))
+    conocido = np.ones(len(repetidos), dtype=bool)
+    conocido[huecos] = False
+    pendientes = np.arange(len(huecos))
+    while len(pendientes):
+        puntero[huecos[pendientes]] = (rng.random(len(pendientes)) * longitud[pendientes]).astype(np.int64)
+        final = puntero[huecos]
+        sin_resolver = np.flatnonzero(~conocido[final])
+        while len(sin_resolver):
+            final[sin_resolver] = puntero[final[sin_resolver]]
+            sin_resolver = sin_resolver[~conocido[final[sin_resolver]]]
+        destinos = repetidos[final].reshape(-1, m)
+        # Rechazo: se vuelve a muestrear cada destino repetido dentro del mismo nodo (se conserva el primero)
+        duplicado = np.zeros(destinos.shape, dtype=bool)
+        for k in range(1, m):
+            duplicado[:, k] = (destinos[:, k:k + 1] == destinos[:, :k]).any(axis=1)
+        pendientes = np.flatnonzero(duplicado.ravel())
+        repetidos[huecos] = destinos.ravel()
+
+    aristas = np.empty((m + m * len(nuevos), 2), dtype=np.intp)
+    aristas[:m, 0] = 0
+    aristas[:m, 1] = np.arange(1, m + 1)
+    aristas[m:, 0] = np.repeat(nuevos, m)
+    aristas[m:, 1] = repetidos[(inicio[:, None] + np.arange(m)).ravel()]
+    return aristas
+
+
+def clasificar_nodos(G):
+    num_nodos = G.number_of_nodes()
+    degrees = dict(G.degree())
+    sorted_nodes = sorted(degrees.items(), key=lambda x: x[1], reverse=True)
+
+    num_suministradores = max(1, int(0.05 * num_nodos))
+    num_estaciones = int(0.60 * num_nodos)
+    num_distribuidores = num_nodos - num_suministradores - num_estaciones
+
+    # Definir tipos de energía y sus variaciones
+    tipos_energia = ['EÓLICA', 'GEOTÉRMICA', 'NUCLEAR', 'OCEÁNICA', 'HIDROELÉCTRICA', 'BIOMASA']
+
+    # Asignar SUMINISTRADORES
+    suministradores = [node for node, deg in sorted_nodes[:num_suministradores]]
+
+    # Asegurar que solo hay un suministrador de tipo SOLAR
+    nodo_solar = suministradores[0]
+    G.nodes[nodo_solar]['tipo'] = 'suministrador'
+    G.nodes[nodo_solar]['energy_type'] = 'SOLAR'
+    G.nodes[nodo_solar]['codigo_energia'] = SOLAR
+    G.nodes[nodo_solar]['produccion'] = random.uniform(10, 20)
+    G.nodes[nodo_solar]['fase'] = 0  # Fase cero para sincronizar con las 06:00
+    G.nodes[nodo_solar]['carga_actual'] = 0
+    G.nodes[nodo_solar]['carga_max'] = G.nodes[nodo_solar]['produccion']
+    G.nodes[nodo_solar]['produccion_anterior'] = 0  # Para determinar si la producción sube o baja
+
+    # Asignar tipos de energía a los demás suministradores
+    otros_suministradores = suministradores[1:]
+    tipos_asignados = random.choices(tipos_energia, k=len(otros_suministradores))
+
+    for node, energy_type in zip(otros_suministradores, tipos_asignados):
+        G.nodes[node]['tipo'] = 'suministrador'
+        G.nodes[node]['energy_type'] = energy_type
+        G.nodes[node]['codigo_energia'] = TIPOS_ENERGIA.index(energy_type)  # Código entero para los desgloses por tipo
+        G.nodes[node]['produccion'] = random.uniform(10, 20)
+        G.nodes[node]['fase'] = random.uniform(0, 2*np.pi)
+        G.nodes[node]['carga_actual'] = 0
+        G.nodes[node]['carga_max'] = G.nodes[node]['produccion']
+        G.nodes[node]['produccion_anterior'] = 0  # Para determinar si la producción sube o baja
+
+    # Asignar ESTACIONES (60% de los nodos con grado 1)
+    estaciones = [node for node, deg in degrees.items() if deg == 1]
+    if len(estaciones) < num_estaciones:
+        # Necesitamos convertir más nodos en estaciones
+        candidatos = [node for node in G.nodes() if node not in suministradores and degrees[node] > 1]
+        random.shuffle(candidatos)
+        while len(estaciones) < num_estaciones and candidatos:
+            nodo = candidatos.pop()
+            # Reducir su grado a 1
+            vecinos = list(G.neighbors(nodo))
+            for vecino in vecinos[1:]:
+                G.remove_edge(nodo, vecino)
+            estaciones.append(nodo)
+            degrees[nodo] = 1
+
+    for node in estaciones:
+        G.nodes[node]['tipo'] = 'estacion'
+        G.nodes[node]['carga_max'] = random.uniform(50, 100)
+        G.nodes[node]['carga_actual'] = 0.5 * G.nodes[node]['carga_max']
+        G.nodes[node]['fase'] = random.uniform(0, 2*np.pi)
+        G.nodes[node]['carga_anterior'] = G.nodes[node]['carga_actual']  # Para determinar si ganó o perdió carga
+
+    # Asignar DISTRIBUIDORES al resto de nodos
+    distribuidores = [node for node in G.nodes() if 'tipo' not in G.nodes[node]]
+    for node in distribuidores:
+        G.nodes[node]['tipo'] = 'distribuidor'
+        G.nodes[node]['carga_actual'] = 0
+        G.nodes[node]['carga_max'] = random.uniform(100, 200)
+        G.nodes[node]['energia_recibida'] = 0
+        G.nodes[node]['energia_enviada'] = 0
+        G.nodes[node]['overloaded'] = False  # Indica si el distribuidor está sobrecargado
+
+    # Índice tipado de la red, construido una sola vez a partir de las listas anteriores
+    nodos = list(G.nodes())
+    posicion = {node: i for i, node in enumerate(nodos)}
+    tipo = np.empty(len(nodos), dtype=np.int8)
+    tipo[[posicion[node] for node in suministradores]] = SUMINISTRADOR
+    tipo[[posicion[node] for node in distribuidores]] = DISTRIBUIDOR
+    tipo[[posicion[node] for node in estaciones]] = ESTACION
+    aristas = np.array([(posicion[u], posicion[v]) for u, v in G.edges()], dtype=np.intp).reshape(-1, 2)
+    return G, IndiceTipado(nodos, tipo, aristas)
+
+
+def clasificar_nodos_arrays(num_nodos, aristas, semilla=None):
+    # Mismas reglas que clasificar_nodos(), pero sobre la lista de aristas (por ejemplo la de
+    # generar_red_arrays()) y sin grafo de NetworkX. El orden de las aristas hace de orden de
+    # adyacencia. Devuelve el índice tipado y los atributos de los nodos en arrays, listos para
+    # NetworkState(None, indice, atributos=atributos).
+    rng = np.random.default_rng(semilla)
+    grado = np.bincount(aristas.ravel(), minlength=num_nodos)
+
+    num_suministradores = max(1, int(0.05 * num_nodos))
+    num_estaciones = int(0.60 * num_nodos)
+
+    # Asignar SUMINISTRADORES: los de mayor grado (a igualdad de grado, en orden de nodo)
+    suministradores = np.argsort(-grado, kind='stable')[:num_suministradores]
+    es_suministrador = np.zeros(num_nodos, dtype=bool)
+    es_suministrador[suministradores] = True
+
+    # Asignar ESTACIONES: los nodos de grado 1 y, si faltan, candidatos reducidos a grado 1.
+    # Como en clasificar_nodos(), los candidatos se barajan y se procesan desde el final; cada uno
+    # conserva su primer vecino que siga conectado en ese momento.
+    estaciones = np.flatnonzero(grado == 1)
+    candidatos = np.flatnonzero(~es_suministrador & (grado > 1))
+    rng.shuffle(candidatos)
+    procesados = candidatos[::-1][:max(num_estaciones - len(estaciones), 0)]
+    orden = np.full(num_nodos, len(procesados), dtype=np.int64)  # Turno de cada candidato procesado
+    orden[procesados] = np.arange(len(procesados))
+    procesado = orden < len(procesados)
+
+    # Aristas dirigidas agrupadas por origen, en orden de adyacencia (los dos sentidos de cada
+    # arista van intercalados para que la ordenación estable respete el orden de las aristas)
+    origen = aristas.ravel()
+    destino = aristas[:, ::-1].ravel()
+    csr = orden_estable(origen, num_nodos)
+    origen, destino = origen[csr], destino[csr]
+    con_aristas = np.flatnonzero(procesado[origen])
+
+    # Vecino conservado por cada candidato: la arista hacia un vecino sigue conectada en su turno si el
+    # vecino no se procesó antes o si lo conservó a él. Sólo depende de candidatos anteriores, así que
+    # se itera hasta el punto fijo.
+    conservado = np.full(num_nodos, -1, dtype=np.int64)
+    while True:
+        o, d = origen[con_aristas], destino[con_aristas]
+        conectada = (orden[d] > orden[o]) | (conservado[d] == o)
+        primera = np.full(num_nodos, len(origen), dtype=np.int64)
+        np.minimum.at(primera, o[conectada], con_aristas[conectada])
+        nuevo = np.where(primera < len(origen), destino[np.minimum(primera, len(origen) - 1)], -1)
+        nuevo[~procesado] = -1
+        if np.array_equal(nuevo, conservado):
+            break
+        conservado = nuevo
+
+    # Una arista sobrevive si ninguno de sus extremos procesados la ha eliminado
+    u, v = aristas[:, 0], aristas[:, 1]
+    sobrevive = (~procesado[u] | (conservado[u] == v)) & (~procesado[v] | (conservado[v] == u))
+    aristas = aristas[sobrevive]
+    estaciones = np.concatenate([estaciones, procesados])
+
+    # Tipos: las estaciones se asignan después de los suministradores y el resto son DISTRIBUIDORES
+    tipo = np.full(num_nodos, DISTRIBUIDOR, dtype=np.int8)
+    tipo[suministradores] = SUMINISTRADOR
+    tipo[estaciones] = ESTACION
+    indice = IndiceTipado(list(range(num_nodos)), tipo, aristas)
+
+    # Atributos, con las mismas distribuciones que clasificar_nodos()
+    carga_actual = np.zeros(num_nodos)
+    carga_max = np.zeros(num_nodos)
+    fase = np.zeros(num_nodos)
+    produccion = np.zeros(num_nodos)
+    codigo_energia = np.full(num_nodos, -1, dtype=np.int8)
+
+    sum_ = indice.suministradores
+    produccion[sum_] = rng.uniform(10, 20, len(sum_))
+    carga_max[sum_] = produccion[sum_]
+    fase[sum_] = rng.uniform(0, 2*np.pi, len(sum_))
+    codigo_energia[sum_] = rng.integers(EOLICA, len(TIPOS_ENERGIA), len(sum_))
+    # Un único suministrador SOLAR (el de mayor grado), con fase cero para sincronizar con las 06:00
+    nodo_solar = suministradores[0]
+    if tipo[nodo_solar] == SUMINISTRADOR:
+        codigo_energia[nodo_solar] = SOLAR
+        fase[nodo_solar] = 0
+
+    est = indice.estaciones
+    carga_max[est] = rng.uniform(50, 100, len(est))
+    carga_actual[est] = 0.5 * carga_max[est]
+    fase[est] = rng.uniform(0, 2*np.pi, len(est))
+
+    dist = indice.distribuidores
+    carga_max[dist] = rng.uniform(100, 200, len(dist))
+
+    atributos = {
+        'carga_actual': carga_actual,
+        'carga_max': carga_max,
+        'fase': fase,
+        'produccion': produccion,
+        'codigo_energia': codigo_energia,
+        'carga_anterior': carga_actual.copy(),
+        'overloaded': np.zeros(num_nodos, dtype=bool),
+    }
+    return indice, atributos
+
+
+# Instantánea inmutable del estado tras un tick: arrays de sólo lectura y estadísticas del tick
+Instantanea = namedtuple('Instantanea', ['t', 'carga_actual', 'carga_anterior', 'overloaded', 'estadisticas'])
+
+# Estadísticas escalares por tick, en el orden en que se exportan
+COLUMNAS_ESTADISTICAS = [
+    't', 'hora_del_dia',
+    'estaciones_carga_cero', 'estaciones_carga_max', 'carga_media_estaciones',
+    'produccion_media_suministradores', 'distribuidores_sobrecargados',
+    'total_energia_acumulada', 'porcentaje_total_carga', 'porcentaje_carga_libre',
+    'capacidad_libre_estaciones', 'total_carga_distribuidores', 'total_carga_estaciones',
+]
+# Estadísticas que son conteos o tiempos enteros
+COLUMNAS_ENTERAS = {'t', 'hora_del_dia', 'estaciones_carga_cero', 'estaciones_carga_max', 'distribuidores_sobrecargados'}
+
+# Número máximo de valores (ticks x suministradores) de producción que step() precalcula de una vez
+TAM_BLOQUE_PRODUCCION = 1 << 20
+
+
+def desglose_por_codigo(codigos, pesos, num_codigos):
+    # Suma de 'pesos' por código (enteros en [0, num_codigos)) en un solo recorrido, en el orden de los códigos
+    return np.bincount(codigos, weights=pesos, minlength=num_codigos)
+
+
+def codigos_presentes(codigos, num_codigos):
+    # Códigos que aparecen al menos una vez, de menor a mayor (orden estable de las categorías)
+    return np.flatnonzero(np.bincount(codigos, minlength=num_codigos)).tolist()
+
+
+def calcular_estadisticas(estado):
+    # Estadísticas de la red en el tick actual (las que muestra dibujar_red()).
+    # 'produccion_por_tipo' sólo incluye los tipos de energía presentes, en el orden de TIPOS_ENERGIA.
+    carga_actual = estado.carga_actual
+    carga_max = estado.carga_max
+    carga_estaciones = carga_actual[estado.estaciones]
+    carga_max_estaciones = carga_max[estado.estaciones]
+    carga_suministradores = carga_actual[estado.suministradores]
+
+    total_carga_actual = carga_actual.sum()
+    total_carga_max = carga_max.sum()
+    porcentaje_total_carga = (total_carga_actual / total_carga_max) * 100 if total_carga_max > 0 else 0
+    porcentaje_carga_libre = ((total_carga_max - total_carga_actual) / total_carga_max) * 100 if total_carga_max > 0 else 0
+
+    # Producción por tipo de energía: un único bincount ponderado sobre los códigos enteros
+    codigos_suministradores = estado.codigo_energia[estado.suministradores]
+    produccion_por_codigo = desglose_por_codigo(codigos_suministradores, carga_suministradores, len(TIPOS_ENERGIA))
+    produccion_por_tipo = {TIPOS_ENERGIA[codigo]: produccion_por_codigo[codigo]
+                           for codigo in codigos_presentes(codigos_suministradores, len(TIPOS_ENERGIA))}
+
+    return {
+        't': estado.t,
+        'hora_del_dia': estado.t % 24,
+        'estaciones_carga_cero': int(np.count_nonzero(carga_estaciones <= 0)),
+        'estaciones_carga_max': int(np.count_nonzero(carga_estaciones >= carga_max_estaciones)),
+        'carga_media_estaciones': carga_estaciones.mean(),
+        'produccion_media_suministradores': carga_suministradores.mean(),
+        'distribuidores_sobrecargados': int(np.count_nonzero(estado.overloaded[estado.distribuidores])),
+        'total_energia_acumulada': total_carga_actual,
+        'porcentaje_total_carga': porcentaje_total_carga,
+        'porcentaje_carga_libre': porcentaje_carga_libre,
+        # Capacidad de carga libre de las estaciones
+        'capacidad_libre_estaciones': (carga_max_estaciones - carga_estaciones).sum(),
+        'total_carga_distribuidores': carga_actual[estado.distribuidores].sum(),
+        'total_carga_estaciones': carga_estaciones.sum(),
+        'produccion_por_tipo': produccion_por_tipo,
+    }
+
+
+class AgregadorEstadisticas:
+    # Estadísticas de la red mantenidas por los núcleos de NetworkState._avanzar() a medida que
+    # cambian el estado: cada paso deja sus totales y conteos con los arrays que ya tiene a mano,
+    # sin volver a recorrer la red. Leerlas (valores()) cuesta O(1) respecto al número de nodos.
+    # calcular_estadisticas() sigue siendo la referencia que recorre todos los nodos;
+    # verificar_agregador() compara las dos (enetsym_headless.py --verificar).
+
+    def __init__(self, estado):
+        # Totales estáticos: la capacidad máxima no cambia durante la simulación
+        self.num_suministradores = len(estado.suministradores)
+        self.num_estaciones = len(estado.estaciones)
+        self.total_carga_max = estado.carga_max.sum()
+        self.total_carga_max_estaciones = estado.carga_max[estado.estaciones].sum()
+        # Tipos de energía presentes, en el orden de TIPOS_ENERGIA
+        self.codigos_presentes = codigos_presentes(estado.codigo_energia[estado.suministradores], len(TIPOS_ENERGIA))
+        self.recalcular(estado)
+
+    def recalcular(self, estado):
+        # Recorrido completo, sólo para el estado inicial
+        carga_actual = estado.carga_actual
+        produccion = carga_actual[estado.suministradores]
+        self.suministradores(produccion, estado.codigo_energia[estado.suministradores])
+        self.distribuidores(carga_actual[estado.distribuidores],
+                            int(np.count_nonzero(estado.overloaded[estado.distribuidores])))
+        self.estaciones(carga_actual[estado.estaciones], estado.carga_max[estado.estaciones])
+
+    def suministradores(self, produccion, codigos):
+        self.total_carga_suministradores = produccion.sum()
+        self.produccion_por_codigo = desglose_por_codigo(codigos, produccion, len(TIPOS_ENERGIA))
+
+    def distribuidores(self, carga, num_sobrecargados):
+        self.total_carga_distribuidores = carga.sum()
+        self.distribuidores_sobrecargados = num_sobrecargados
+
+    def estaciones(self, carga, carga_max):
+        self.total_carga_estaciones = carga.sum()
+        self.estaciones_carga_cero = int(np.count_nonzero(carga <= 0))
+        self.estaciones_carga_max = int(np.count_nonzero(carga >= carga_max))
+
+    def valores(self, t):
+        # Mismas claves que calcular_estadisticas()
+        total_carga_actual = self.total_carga_suministradores + self.total_carga_distribuidores + self.total_carga_estaciones
+        total_carga_max = self.total_carga_max
+        porcentaje_total_carga = (total_carga_actual / total_carga_max) * 100 if total_carga_max > 0 else 0
+        porcentaje_carga_libre = ((total_carga_max - total_carga_actual) / total_carga_max) * 100 if total_carga_max > 0 else 0
+        return {
+            't': t,
+            'hora_del_dia': t % 24,
+            'estaciones_carga_cero': self.estaciones_carga_cero,
+            'estaciones_carga_max': self.estaciones_carga_max,
+            'carga_media_estaciones': (self.total_carga_estaciones / self.num_estaciones
+                                       if self.num_estaciones else np.nan),
+            'produccion_media_suministradores': (self.total_carga_suministradores / self.num_suministradores
+                                                 if self.num_suministradores else np.nan),
+            'distribuidores_sobrecargados': self.distribuidores_sobrecargados,
+            'total_energia_acumulada': total_carga_actual,
+            'porcentaje_total_carga': porcentaje_total_carga,
+            'porcentaje_carga_libre': porcentaje_carga_libre,
+            'capacidad_libre_estaciones': self.total_carga_max_estaciones - self.total_carga_estaciones,
+            'total_carga_distribuidores': self.total_carga_distribuidores,
+            'total_carga_estaciones': self.total_carga_estaciones,
+            'produccion_por_tipo': {TIPOS_ENERGIA[codigo]: self.produccion_por_codigo[codigo]
+                                    for codigo in self.codigos_presentes},
+        }
+
+
+
+def verificar_agregador(estado):
+    # Compara las estadísticas incrementales del agregador con calcular_estadisticas() en el tick
+    # actual; lanza RuntimeError con la primera que no coincide
+    incrementales = estado.agregador.valores(estado.t)
+    referencia = calcular_estadisticas(estado)
+    for clave, esperado in referencia.items():
+        valor = incrementales[clave]
+        if clave == 'produccion_por_tipo':
+            iguales = list(valor) == list(esperado) and np.allclose(
+                list(valor.values()), list(esperado.values()), rtol=1e-9, atol=1e-9)
+        else:
+            iguales = np.isclose(valor, esperado, rtol=1e-9, atol=1e-9, equal_nan=True)
+        if not iguales:
+            raise RuntimeError(f"Estadística '{clave}' en t={estado.t}: agregador {valor}, recorrido completo {esperado}")
+
+def orden_estable(claves, num_claves):
+    # Permutación que agrupa 'claves' (enteros en [0, num_claves)) de menor a mayor manteniendo el
+    # orden original dentro de cada grupo. Equivale a np.argsort(claves, kind='stable'), pero la
+    # conversión COO -> CSR de SciPy lo hace por conteo, varias veces más rápido en millones de aristas.
+    posiciones = np.arange(len(claves))
+    matriz = sparse.csr_matrix((np.ones(len(claves), dtype=np.int8), (claves, posiciones)),
+                               shape=(num_claves, len(claves)))
+    matriz.sort_indices()
+    return matriz.indices.astype(np.intp)
+
+
+class IndiceTipado:
+    # Índice de la red por tipo de nodo: arrays contiguos de índices por rol y listas de
+    # vecinos de cada nodo separadas por rol (en formato CSR). La topología no cambia
+    # durante la simulación, así que se construye una vez y se reutiliza en cada tick y
+    # en cada dibujo en lugar de volver a recorrer y filtrar el grafo.
+
+    def __init__(self, nodos, tipo, aristas):
+        # nodos: etiqueta de cada nodo; tipo: código de tipo por nodo; aristas: pares (u, v) en índices
+        num_nodos = len(nodos)
+        self.nodos = nodos
+        self.posicion = {node: i for i, node in enumerate(nodos)}
+        self.tipo = tipo
+        self.suministradores = np.flatnonzero(tipo == SUMINISTRADOR)
+        self.distribuidores = np.flatnonzero(tipo == DISTRIBUIDOR)
+        self.estaciones = np.flatnonzero(tipo == ESTACION)
+
+        # Adyacencia completa en CSR (cada arista aparece en los dos sentidos)
+        origen = np.concatenate([aristas[:, 0], aristas[:, 1]])
+        destino = np.concatenate([aristas[:, 1], aristas[:, 0]])
+        orden = orden_estable(origen, num_nodos)
+        self.origen = origen[orden]
+        self.destino = destino[orden]
+        self.grado = np.bincount(origen, minlength=num_nodos)
+        self.punteros = np.concatenate([[0], np.cumsum(self.grado)])
+
+        # Vecinos de cada nodo separados por el tipo del vecino: {tipo: (punteros, indices)}
+        self.vecinos_por_tipo = {}
+        for codigo in range(len(TIPOS_NODO)):
+            mascara = tipo[self.destino] == codigo
+            conteo = np.bincount(self.origen[mascara], minlength=num_nodos)
+            self.vecinos_por_tipo[codigo] = (np.concatenate([[0], np.cumsum(conteo)]), self.destino[mascara])
+
+        # Posición de cada nodo dentro del array de su rol
+        self.fila = np.full(num_nodos, -1, dtype=np.intp)
+        for indices in (self.suministradores, self.distribuidores, self.estaciones):
+            self.fila[indices] = np.arange(len(indices))
+
+    def vecinos_de(self, i, tipo=None):
+        # Vecinos del nodo i (todos, o sólo los del tipo indicado)
+        if tipo is None:
+            return self.destino[self.punteros[i]:self.punteros[i + 1]]
+        punteros, indices = self.vecinos_por_tipo[tipo]
+        return indices[punteros[i]:punteros[i + 1]]
+
+    def aristas_entre(self, tipo_origen, tipo_destino):
+        # Aristas dirigidas (origen, destino) entre nodos de los dos tipos indicados
+        mascara = (self.tipo[self.origen] == tipo_origen) & (self.tipo[self.destino] == tipo_destino)
+        return self.origen[mascara], self.destino[mascara]
+
+
+def calcular_produccion(t, energy_type, produccion_base, fase):
+    if energy_type == 'EÓLICA':
+        # Energía eólica varía rápidamente
+        produccion = abs(np.sin(0.2 * t + fase)) * produccion_base
+    elif energy_type == 'SOLAR':
+        # Energía solar varía con el ciclo del día (06:00 a 18:00)
+        hora = (t % 24)
+        if 6 <= hora <= 18:
+            angulo = ((hora - 6) / 12) * np.pi  # De 0 a π
+            produccion = np.sin(angulo) * produccion_base
+        else:
+            produccion = 0
+    elif energy_type == 'GEOTÉRMICA':
+        # Energía geotérmica es estable
+        produccion = produccion_base * 0.9 + 0.1 * produccion_base * np.sin(0.05 * t + fase)
+    elif energy_type == 'NUCLEAR':
+        # Energía nuclear es muy estable
+        produccion = produccion_base
+    elif energy_type == 'OCEÁNICA':
+        # Energía oceánica varía con las mareas
+        produccion = abs(np.sin(0.05 * t + fase)) * produccion_base
+    elif energy_type == 'HIDROELÉCTRICA':
+        # Energía hidroeléctrica es relativamente estable
+        produccion = produccion_base * 0.8 + 0.2 * produccion_base * np.sin(0.05 * t + fase)
+    elif energy_type == 'BIOMASA':
+        # Biomasa es estable
+        produccion = produccion_base * 0.95 + 0.05 * produccion_base * np.sin(0.02 * t + fase)
+    else:
+        produccion = produccion_base
+    return produccion
+
+
+def calcular_produccion_vectorizada(t, codigos, produccion_base, fase):
+    # Producción de todos los suministradores con una sola llamada, con las mismas fórmulas
+    # que calcular_produccion(). codigos, produccion_base y fase son arrays por suministrador.
+    # Si t es un escalar devuelve un array por suministrador; si t es un array de ticks
+    # devuelve una matriz (ticks x suministradores).
+    t = np.asarray(t, dtype=np.float64)[..., None]
+    produccion = np.empty(np.broadcast_shapes(t.shape, produccion_base.shape))
+    # NUCLEAR (muy estable) y cualquier tipo desconocido producen la producción base
+    produccion[...] = produccion_base
+
+    m = codigos == EOLICA
+    if m.any():
+        # Energía eólica varía rápidamente
+        produccion[..., m] = np.abs(np.sin(0.2 * t + fase[m])) * produccion_base[m]
+    m = codigos == SOLAR
+    if m.any():
+        # Energía solar varía con el ciclo del día (06:00 a 18:00)
+        hora = (t % 24)
+        angulo = ((hora - 6) / 12) * np.pi  # De 0 a π
+        produccion[..., m] = np.where((6 <= hora) & (hora <= 18), np.sin(angulo) * produccion_base[m], 0)
+    m = codigos == GEOTERMICA
+    if m.any():
+        # Energía geotérmica es estable
+        produccion[..., m] = produccion_base[m] * 0.9 + 0.1 * produccion_base[m] * np.sin(0.05 * t + fase[m])
+    m = codigos == OCEANICA
+    if m.any():
+        # Energía oceánica varía con las mareas
+        produccion[..., m] = np.abs(np.sin(0.05 * t + fase[m])) * produccion_base[m]
+    m = codigos == HIDROELECTRICA
+    if m.any():
+        # Energía hidroeléctrica es relativamente estable
+        produccion[..., m] = produccion_base[m] * 0.8 + 0.2 * produccion_base[m] * np.sin(0.05 * t + fase[m])
+    m = codigos == BIOMASA
+    if m.any():
+        # Biomasa es estable
+        produccion[..., m] = produccion_base[m] * 0.95 + 0.05 * produccion_base[m] * np.sin(0.02 * t + fase[m])
+    return produccion
+
+
+def atributos_de_grafo(G, nodos):
+    # Atributos de los nodos de un grafo clasificado, en arrays en el orden de 'nodos'
+    datos = [G.nodes[node] for node in nodos]
+    return {
+        'carga_actual': np.array([d['carga_actual'] for d in datos], dtype=np.float64),
+        'carga_max': np.array([d['carga_max'] for d in datos], dtype=np.float64),
+        'fase': np.array([d.get('fase', 0.0) for d in datos], dtype=np.float64),
+        'produccion': np.array([d.get('produccion', 0.0) for d in datos], dtype=np.float64),
+        # -1 para los nodos que no son suministradores
+        'codigo_energia': np.array([d.get('codigo_energia', -1) for d in datos], dtype=np.int8),
+        # Carga del tick anterior: 'produccion_anterior' en suministradores y 'carga_anterior' en estaciones
+        'carga_anterior': np.array(
+            [d.get('produccion_anterior', d.get('carga_anterior', d['carga_actual'])) for d in datos],
+            dtype=np.float64),
+        'overloaded': np.array([d.get('overloaded', False) for d in datos], dtype=bool),
+    }
+
+
+class NetworkState:
+    # Estado de la red en arrays contiguos de NumPy, una posición por nodo.
+    # Se construye una sola vez a partir de la salida de clasificar_nodos(); a partir
+    # de ahí el grafo de NetworkX sólo queda como topología de origen.
+
+    def __init__(self, G, indice, modo_despacho='vectorizado', atributos=None):
+        # modo_despacho: 'vectorizado' (núcleo por segmentos) o 'bucle' (bucle por distribuidor original)
+        # atributos: arrays ya construidos (clasificar_nodos_arrays()); si no, se leen de G
+        self.modo_despacho = modo_despacho
+        self.indice = indice
+        self.nodos = indice.nodos
+        self.posicion = indice.posicion
+        if atributos is None:
+            atributos = atributos_de_grafo(G, self.nodos)
+
+        self.tipo = indice.tipo
+        self.carga_actual = atributos['carga_actual']
+        self.carga_max = atributos['carga_max']
+        self.fase = atributos['fase']
+        self.produccion = atributos['produccion']
+        self.codigo_energia = atributos['codigo_energia']
+        self.carga_anterior = atributos['carga_anterior']
+        self.energia_recibida = np.zeros(len(self.nodos), dtype=np.float64)
+        self.energia_enviada = np.zeros(len(self.nodos), dtype=np.float64)
+        self.overloaded = atributos['overloaded']
+
+        # Índices de cada tipo de nodo
+        self.suministradores = indice.suministradores
+        self.distribuidores = indice.distribuidores
+        self.estaciones = indice.estaciones
+
+        # Matriz dispersa (CSR) de inyección suministrador -> distribuidor.
+        # Cada suministrador reparte su producción a partes iguales entre todos sus vecinos
+        # (peso 1/grado), pero sólo la reciben los vecinos que son distribuidores.
+        origen, destino = indice.aristas_entre(SUMINISTRADOR, DISTRIBUIDOR)
+        self.inyeccion = sparse.csr_matrix(
+            (1.0 / indice.grado[origen], (indice.fila[destino], indice.fila[origen])),
+            shape=(len(self.distribuidores), len(self.suministradores)))
+
+        # Índice distribuidor -> estación para el despacho por segmentos.
+        # Las estaciones quedan con grado 1 tras clasificar_nodos(), así que cada estación
+        # cuelga como mucho de un distribuidor y los segmentos no se solapan.
+        origen, destino = indice.aristas_entre(DISTRIBUIDOR, ESTACION)
+        self.estaciones_servidas = destino
+        self.padre_estacion = indice.fila[origen]
+
+        # Datos estáticos por rol, extraídos una sola vez en lugar de en cada tick
+        self.codigo_suministradores = self.codigo_energia[self.suministradores]
+        self.produccion_suministradores = self.produccion[self.suministradores]
+        self.fase_suministradores = self.fase[self.suministradores]
+        self.carga_max_estaciones = self.carga_max[self.estaciones]
+        self.fase_estaciones = self.fase[self.estaciones]
+        self.amplitud_estaciones = 0.05 * self.carga_max_estaciones
+
+        self.t = 0  # Tiempo inicial
+        self.agregador = AgregadorEstadisticas(self)
+
+    def tick(self):
+        produccion = calcular_produccion_vectorizada(
+            self.t + 1, self.codigo_suministradores, self.produccion_suministradores, self.fase_suministradores)
+        self._avanzar(produccion)
+
+    def step(self, n, record_every=1, tras_tick=None):
+        # Avanza n ticks seguidos y devuelve las estadísticas muestreadas en los ticks cuyo t es
+        # múltiplo de record_every, como un array por estadística (más 'produccion_por_tipo',
+        # una matriz muestras x TIPOS_ENERGIA). La producción se precalcula por bloques de ticks.
+        # tras_tick(t, carga_actual), si se indica, se llama después de cada tick (por ejemplo,
+        # para grabar el historial de los nodos sin partir el bloque).
+        num_muestras = (self.t + n) // record_every - self.t // record_every
+        muestras = {c: np.empty(num_muestras, dtype=np.int64 if c in COLUMNAS_ENTERAS else np.float64)
+                    for c in COLUMNAS_ESTADISTICAS}
+        muestras['produccion_por_tipo'] = np.zeros((num_muestras, len(TIPOS_ENERGIA)))
+        tam_bloque = max(1, TAM_BLOQUE_PRODUCCION // max(len(self.suministradores), 1))
+        fila = 0
+        restantes = n
+        while restantes > 0:
+            ticks = np.arange(self.t + 1, self.t + 1 + min(tam_bloque, restantes))
+            produccion_bloque = calcular_produccion_vectorizada(
+                ticks, self.codigo_suministradores, self.produccion_suministradores, self.fase_suministradores)
+            for produccion in produccion_bloque:
+                self._avanzar(produccion)
+                if tras_tick is not None:
+                    tras_tick(self.t, self.carga_actual)
+                if self.t % record_every == 0:
+                    estadisticas = self.agregador.valores(self.t)
+                    for c in COLUMNAS_ESTADISTICAS:
+                        muestras[c][fila] = estadisticas[c]
+                    muestras['produccion_por_tipo'][fila] = self.agregador.produccion_por_codigo
+                    fila += 1
+            restantes -= len(ticks)
+        return muestras
+
+    def _avanzar(self, produccion):
+        # Un tick de simulación con la producción de los suministradores ya calculada
+        self.t += 1  # Avanza 1 unidad de tiempo en cada iteración
+        t = self.t
+        carga_actual = self.carga_actual
+
+        # Reiniciar energía recibida y enviada en distribuidores
+        distribuidores = self.distribuidores
+        self.energia_recibida[distribuidores] = 0
+        self.energia_enviada[distribuidores] = 0
+        # Si estaba sobrecargado, restablecer
+        sobrecargados = distribuidores[self.overloaded[distribuidores]]
+        self.overloaded[sobrecargados] = False
+        carga_actual[sobrecargados] = 0
+
+        # SUMINISTRADORES generan energía
+        suministradores = self.suministradores
+        self.carga_anterior[suministradores] = carga_actual[suministradores]
+        carga_actual[suministradores] = produccion
+        self.agregador.suministradores(produccion, self.codigo_suministradores)
+        # Inyección en todos los distribuidores con un único producto matriz-vector
+        self.energia_recibida[distribuidores] = self.inyeccion @ produccion
+
+        # DISTRIBUIDORES reciben y envían energía
+        if self.modo_despacho == 'bucle':
+            self._despachar_bucle()
+        else:
+            self._despachar_vectorizado()
+
+        # ESTACIONES consumen o producen energía
+        # (la carga anterior de las estaciones es la que tienen justo antes de este paso)
+        estaciones = self.estaciones
+        carga_estaciones = carga_actual[estaciones]
+        self.carga_anterior[estaciones] = carga_estaciones
+        amplitud = self.amplitud_estaciones
+        delta_carga = amplitud * np.sin(0.1 * t + self.fase_estaciones)
+        delta_carga = np.clip(delta_carga, -amplitud, amplitud)
+        carga_estaciones = np.clip(carga_estaciones + delta_carga, 0, self.carga_max_estaciones)
+        carga_actual[estaciones] = carga_estaciones
+        self.agregador.estaciones(carga_estaciones, self.carga_max_estaciones)
+
+    def instantanea(self):
+        # Copia inmutable del estado dinámico, para leerla desde otro hilo mientras se sigue simulando
+        arrays = []
+        for array in (self.carga_actual, self.carga_anterior, self.overloaded):
+            copia = array.copy()
+            copia.setflags(write=False)
+            arrays.append(copia)
+        return Instantanea(self.t, *arrays, self.agregador.valores(self.t))
+
+    def _despachar_bucle(self):
+        # Despacho original, distribuidor a distribuidor
+        carga_actual = self.carga_actual
+        carga_max = self.carga_max
+        for node in self.distribuidores:
+            if self.overloaded[node]:
+                continue
+            # Recibir energía de suministradores y estaciones
+            energia_recibida = self.energia_recibida[node]
+            estaciones_vecinas = self.indice.vecinos_de(node, ESTACION)
+            for estacion in estaciones_vecinas:
+                if carga_actual[estacion] >= carga_max[estacion]:
+                    # Absorber energía de la estación
+                    delta = min(5, carga_actual[estacion])
+                    carga_actual[estacion] -= delta
+                    energia_recibida += delta
+            carga_actual[node] += energia_recibida
+
+            # Verificar si excede su carga máxima
+            if carga_actual[node] >= carga_max[node]:
+                self.overloaded[node] = True  # Marcar como sobrecargado
+                carga_actual[node] = carga_max[node]
+            else:
+                # Enviar energía a estaciones que no están al 100%
+                energia_disponible = carga_actual[node]
+                estaciones_para_enviar = [n for n in estaciones_vecinas if carga_actual[n] < carga_max[n]]
+                if estaciones_para_enviar:
+                    carga_por_estacion = energia_disponible / len(estaciones_para_enviar)
+                    for estacion in estaciones_para_enviar:
+                        carga_actual[estacion] = min(carga_actual[estacion] + carga_por_estacion, carga_max[estacion])
+                        self.energia_enviada[node] += carga_por_estacion
+                    carga_actual[node] = max(carga_actual[node] - self.energia_enviada[node], 0)
+        self.agregador.distribuidores(carga_actual[self.distribuidores],
+                                      int(np.count_nonzero(self.overloaded[self.distribuidores])))
+
+    def _despachar_vectorizado(self):
+        # Mismo despacho que _despachar_bucle(), pero sobre todos los distribuidores a la vez
+        # con operaciones por segmentos (bincount) sobre el índice distribuidor -> estación
+        carga_actual = self.carga_actual
+        carga_max = self.carga_max
+        distribuidores = self.distribuidores
+        estaciones = self.estaciones_servidas
+        padre = self.padre_estacion
+        num_distribuidores = len(distribuidores)
+
+        # Los distribuidores sobrecargados no despachan (tras el reinicio del tick no queda ninguno)
+        activo = ~self.overloaded[distribuidores]
+        servida = activo[padre]
+
+        # Absorber hasta 5 unidades de las estaciones llenas
+        carga_estaciones = carga_actual[estaciones]
+        carga_max_estaciones = carga_max[estaciones]
+        llena = servida & (carga_estaciones >= carga_max_estaciones)
+        delta = np.where(llena, np.minimum(5, carga_estaciones), 0)
+        carga_estaciones -= delta
+        absorbido = np.bincount(padre, weights=delta, minlength=num_distribuidores)
+        carga_distribuidores = carga_actual[distribuidores]
+        carga_distribuidores += np.where(activo, self.energia_recibida[distribuidores] + absorbido, 0)
+
+        # Verificar si exceden su carga máxima
+        carga_max_distribuidores = carga_max[distribuidores]
+        sobrecargado = activo & (carga_distribuidores >= carga_max_distribuidores)
+        carga_distribuidores[sobrecargado] = carga_max_distribuidores[sobrecargado]
+        self.overloaded[distribuidores[sobrecargado]] = True
+
+        # Repartir a partes iguales entre las estaciones que no están al 100%
+        envia = activo & ~sobrecargado
+        destino = envia[padre] & (carga_estaciones < carga_max_estaciones)
+        num_destinos = np.bincount(padre, weights=destino, minlength=num_distribuidores)
+        con_destinos = num_destinos > 0
+        carga_por_estacion = np.divide(carga_distribuidores, num_destinos,
+                                       out=np.zeros(num_distribuidores), where=con_destinos)
+        carga_estaciones = np.where(destino,
+                                    np.minimum(carga_estaciones + carga_por_estacion[padre], carga_max_estaciones),
+                                    carga_estaciones)
+        energia_enviada = carga_por_estacion * num_destinos
+        self.energia_enviada[distribuidores] = energia_enviada
+        carga_distribuidores = np.where(con_destinos, np.maximum(carga_distribuidores - energia_enviada, 0),
+                                        carga_distribuidores)
+
+        carga_actual[estaciones] = carga_estaciones
+        carga_actual[distribuidores] = carga_distribuidores
+        self.agregador.distribuidores(carga_distribuidores, int(np.count_nonzero(sobrecargado)))
+
+
+class HiloSimulacion(threading.Thread):
+    # Hilo que avanza la simulación a su propio ritmo (un tick cada dt segundos, o tan rápido
+    # como sea posible con dt=0), independiente de lo que tarde en dibujarse cada frame.
+    # Tras cada tick publica una Instantanea en 'ultima_instantanea' y la pasa a los suscriptores,
+    # que se ejecutan en este hilo y deben ser rápidos.
+
+    def __init__(self, estado, dt):
+        super().__init__(daemon=True)
+        self.estado = estado
+        self.dt = dt
+        self.suscriptores = []
+        self.ultima_instantanea = estado.instantanea()
+        self._detener = threading.Event()
+
+    def suscribir(self, funcion):
+        self.suscriptores.append(funcion)
+
+    def detener(self):
+        self._detener.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        try:
+            siguiente = time.perf_counter()
+            while not self._detener.is_set():
+                self.estado.tick()
+                instantanea = self.estado.instantanea()
+                self.ultima_instantanea = instantanea
+                for funcion in self.suscriptores:
+                    funcion(instantanea)
+                if self.dt > 0:
+                    siguiente += self.dt
+                    espera = siguiente - time.perf_counter()
+                    if espera > 0:
+                        self._detener.wait(espera)
+                    else:
+                        siguiente = time.perf_counter()  # Sin acumular retraso si un tick se alarga
+        except Exception as e:
+            print("Ocurrió un error en la simulación:")
+            print(e)
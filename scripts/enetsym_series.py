@@ -0,0 +1,232 @@
+import os
+
+import numpy as np
+
+from enetsym_motor import TIPOS_ENERGIA, COLUMNAS_ESTADISTICAS, COLUMNAS_ENTERAS
+
+# Series de tiempo de las estadísticas: almacén en memoria compartido por la interfaz
+# (enetsym28.py) y el grabador de frames (enetsym_grabacion.py), y grabación en disco de
+# todas las estadísticas por tick (interfaz y enetsym_headless.py). No usa tkinter ni matplotlib.
+
+# Columnas de la grabación en disco: las estadísticas escalares y la producción de cada tipo de energía
+COLUMNAS_GRABACION = COLUMNAS_ESTADISTICAS + [f'produccion_{tipo}' for tipo in TIPOS_ENERGIA]
+FILAS_BLOQUE_GRABACION = 8192  # Filas que se acumulan en memoria antes de escribirlas en disco
+
+
+class AlmacenSeries:
+    # Series de tiempo (la columna 't' y una por estadística) en buffers circulares preasignados
+    # de 'ventana' puntos, cada columna con su dtype. Añadir puntos sólo escribe en los buffers:
+    # la memoria no crece con la duración de la simulación y se conservan los últimos 'ventana'.
+    # Los puntos se numeran desde el principio (índice absoluto); el punto i está en la
+    # posición i % ventana de cada buffer.
+    #
+    # Para dibujar, cada serie tiene además resúmenes min/max a varias resoluciones: el nivel k
+    # tiene un cubo por cada 2**k puntos consecutivos y guarda los índices de su mínimo y de su
+    # máximo, también en buffers circulares. vista() devuelve como mucho dos puntos por cubo sin
+    # recorrer la serie: dibujarla cuesta lo mismo sea cual sea su longitud, y los picos (como
+    # las ráfagas de distribuidores sobrecargados) siguen viéndose.
+    def __init__(self, columnas, ventana, tipos=None):
+        # tipos: dtype de las columnas que no son float64
+        tipos = tipos or {}
+        self.columnas = list(columnas)
+        self.ventana = ventana
+        self.tipos = {c: tipos.get(c, np.float64) for c in ['t'] + self.columnas}
+        self.datos = {c: np.zeros(ventana, dtype=self.tipos[c]) for c in self.tipos}
+        self.longitud = 0  # Puntos añadidos desde el principio
+        # minimos[c][k] y maximos[c][k]: índices del mínimo y del máximo de los cubos del nivel k,
+        # el cubo b en la posición b % capacidades[k] (el nivel 0 son los propios puntos y no se
+        # guarda); cubos[k]: cubos completos del nivel k desde el principio
+        num_niveles = ventana.bit_length()
+        self.capacidades = [None] + [(ventana >> k) + 2 for k in range(1, num_niveles + 1)]
+        self.minimos = {c: [None] + [np.zeros(n, dtype=np.int64) for n in self.capacidades[1:]]
+                        for c in self.columnas}
+        self.maximos = {c: [None] + [np.zeros(n, dtype=np.int64) for n in self.capacidades[1:]]
+                        for c in self.columnas}
+        self.cubos = [0] * (num_niveles + 1)
+
+    def __len__(self):
+        # Puntos guardados (como mucho 'ventana')
+        return min(self.longitud, self.ventana)
+
+    def anadir_fila(self, fila):
+        # Añade un punto con los valores fila['t'] y fila[c] de cada columna
+        posicion = self.longitud % self.ventana
+        for c, datos in self.datos.items():
+            datos[posicion] = fila[c]
+        self.longitud += 1
+
+    def anadir(self, t, valores):
+        # Añade al final los puntos de t y de valores[c] (secuencias de la misma longitud)
+        n = len(t)
+        omitidos = max(0, n - self.ventana)  # Si llegan más puntos que la ventana, sólo caben los últimos
+        inicio = self.longitud + omitidos
+        posicion = inicio % self.ventana
+        primera_parte = min(n - omitidos, self.ventana - posicion)
+        for c, datos in self.datos.items():
+            origen = np.asarray(t if c == 't' else valores[c])[omitidos:]
+            datos[posicion:posicion + primera_parte] = origen[:primera_parte]
+            datos[:len(origen) - primera_parte] = origen[primera_parte:]
+        self.longitud += n
+        self.ampliar_niveles()
+
+    def ultimo(self, columna):
+        return self.datos[columna][(self.longitud - 1) % self.ventana]
+
+    def ultimos(self, columna, n=None):
+        # Los últimos n puntos guardados (todos si n es None), en orden de tiempo
+        n = len(self) if n is None else min(n, len(self))
+        fin = self.longitud % self.ventana or self.ventana
+        datos = self.datos[columna]
+        if n <= fin:
+            return datos[fin - n:fin]
+        return np.concatenate([datos[self.ventana - (n - fin):], datos[:fin]])
+
+    def ampliar_niveles(self):
+        # Completar los cubos nuevos de cada nivel a partir de los pares de cubos del nivel
+        # anterior. Sólo se calculan los cubos que caen enteros dentro de la ventana.
+        inicio_ventana = max(0, self.longitud - self.ventana)
+        for k in range(1, len(self.cubos)):
+            total = self.longitud >> k
+            hechos = max(self.cubos[k], -(-inicio_ventana >> k))
+            if hechos >= total:
+                break  # Si un nivel no cambia, los de encima tampoco
+            pares = 2 * np.arange(hechos, total)
+            for c in self.columnas:
+                v = self.datos[c]
+                if k == 1:
+                    min_a = max_a = pares
+                    min_b = max_b = pares + 1
+                else:
+                    capacidad = self.capacidades[k - 1]
+                    minimos, maximos = self.minimos[c][k - 1], self.maximos[c][k - 1]
+                    min_a, min_b = minimos[pares % capacidad], minimos[(pares + 1) % capacidad]
+                    max_a, max_b = maximos[pares % capacidad], maximos[(pares + 1) % capacidad]
+                posiciones = np.arange(hechos, total) % self.capacidades[k]
+                self.minimos[c][k][posiciones] = np.where(
+                    v[min_b % self.ventana] < v[min_a % self.ventana], min_b, min_a)
+                self.maximos[c][k][posiciones] = np.where(
+                    v[max_b % self.ventana] > v[max_a % self.ventana], max_b, max_a)
+            self.cubos[k] = total
+
+    def cubo(self, columna, k, b):
+        # Índices del mínimo y del máximo del cubo b del nivel k, en orden de tiempo
+        if k == 0:
+            return [b]
+        posicion = b % self.capacidades[k]
+        return sorted((self.minimos[columna][k][posicion], self.maximos[columna][k][posicion]))
+
+    def vista(self, columna, max_cubos):
+        # Tiempos y valores de la serie reducidos a unos max_cubos cubos (mínimo y máximo de cada
+        # uno, en orden de tiempo): el nivel más fino que cabe, más un cubo de cada nivel inferior
+        # para cubrir el principio y el final de la ventana que no llenan un cubo de ese nivel.
+        # El primer y el último punto se incluyen siempre, para que la línea empiece y acabe
+        # donde la serie.
+        self.ampliar_niveles()
+        n = self.longitud
+        inicio = max(0, n - self.ventana)
+        t, v = self.datos['t'], self.datos[columna]
+        if n - inicio <= 2 * max_cubos:
+            return self.ultimos('t'), self.ultimos(columna)
+        max_cubos = max(max_cubos, 4)  # Así la ventana contiene al menos un cubo entero del nivel elegido
+        k = 1
+        while ((n - inicio) >> k) > max_cubos:
+            k += 1
+        partes = [[inicio]]
+        c = inicio
+        for j in range(k):
+            if (c >> j) & 1:
+                partes.append(self.cubo(columna, j, c >> j))
+                c += 1 << j
+        posiciones = np.arange(c >> k, n >> k) % self.capacidades[k]
+        partes.append(np.sort(np.column_stack([self.minimos[columna][k][posiciones],
+                                               self.maximos[columna][k][posiciones]]), axis=1).ravel())
+        c = (n >> k) << k
+        for j in range(k - 1, -1, -1):
+            if (n >> j) & 1:
+                partes.append(self.cubo(columna, j, c >> j))
+                c += 1 << j
+        partes.append([n - 1])
+        indices = np.concatenate(partes) % self.ventana
+        return t[indices], v[indices]
+
+
+class GrabadorEstadisticas:
+    # Grabación en disco de las estadísticas de todos los ticks, sin ventana: un fichero .npy
+    # por columna de COLUMNAS_GRABACION en el que sólo se añaden datos al final. Las filas se
+    # acumulan en un bloque preasignado y se escriben de FILAS_BLOQUE_GRABACION en
+    # FILAS_BLOQUE_GRABACION; tras cada bloque se reescribe la cabecera con el número de filas
+    # (numpy deja hueco en la cabecera para que crezca), así que los ficheros se pueden leer en
+    # cualquier momento con leer_estadisticas() sin cargarlos enteros en memoria.
+    def __init__(self, directorio, filas_bloque=FILAS_BLOQUE_GRABACION):
+        os.makedirs(directorio, exist_ok=True)
+        self.tipos = {c: np.dtype(np.int64 if c in COLUMNAS_ENTERAS else np.float64) for c in COLUMNAS_GRABACION}
+        self.bloque = {c: np.zeros(filas_bloque, dtype=self.tipos[c]) for c in COLUMNAS_GRABACION}
+        self.produccion = [self.bloque[f'produccion_{tipo}'] for tipo in TIPOS_ENERGIA]
+        self.filas_bloque = 0  # Filas del bloque pendientes de escribir
+        self.filas_escritas = 0
+        self.ficheros = {c: open(os.path.join(directorio, f'{c}.npy'), 'wb') for c in COLUMNAS_GRABACION}
+        for c in COLUMNAS_GRABACION:
+            self.escribir_cabecera(c)
+
+    def escribir_cabecera(self, columna):
+        fichero = self.ficheros[columna]
+        fichero.seek(0)
+        np.lib.format.write_array_header_1_0(fichero, {
+            'descr': np.lib.format.dtype_to_descr(self.tipos[columna]),
+            'fortran_order': False,
+            'shape': (self.filas_escritas,),
+        })
+        fichero.seek(0, os.SEEK_END)
+
+    def anadir(self, estadisticas):
+        # Una fila con las estadísticas de un tick (el diccionario de calcular_estadisticas())
+        fila = self.filas_bloque
+        for c in COLUMNAS_ESTADISTICAS:
+            self.bloque[c][fila] = estadisticas[c]
+        produccion_por_tipo = estadisticas['produccion_por_tipo']
+        for tipo, columna in zip(TIPOS_ENERGIA, self.produccion):
+            columna[fila] = produccion_por_tipo.get(tipo, 0)
+        self.filas_bloque += 1
+        if self.filas_bloque == len(self.bloque['t']):
+            self.volcar()
+
+    def anadir_muestras(self, muestras):
+        # Las filas de un NetworkState.step(): un array por estadística y 'produccion_por_tipo'
+        # como matriz muestras x TIPOS_ENERGIA
+        num_muestras = len(muestras['t'])
+        hechas = 0
+        while hechas < num_muestras:
+            n = min(num_muestras - hechas, len(self.bloque['t']) - self.filas_bloque)
+            destino = slice(self.filas_bloque, self.filas_bloque + n)
+            for c in COLUMNAS_ESTADISTICAS:
+                self.bloque[c][destino] = muestras[c][hechas:hechas + n]
+            for codigo, columna in enumerate(self.produccion):
+                columna[destino] = muestras['produccion_por_tipo'][hechas:hechas + n, codigo]
+            hechas += n
+            self.filas_bloque += n
+            if self.filas_bloque == len(self.bloque['t']):
+                self.volcar()
+
+    def volcar(self):
+        # Escribir las filas pendientes al final de cada fichero y actualizar las cabeceras
+        if not self.filas_bloque:
+            return
+        for c, fichero in self.ficheros.items():
+            fichero.write(self.bloque[c][:self.filas_bloque].tobytes())
+        self.filas_escritas += self.filas_bloque
+        self.filas_bloque = 0
+        for c, fichero in self.ficheros.items():
+            self.escribir_cabecera(c)
+            fichero.flush()
+
+    def cerrar(self):
+        self.volcar()
+        for fichero in self.ficheros.values():
+            fichero.close()
+
+
+def leer_estadisticas(directorio):
+    # Columnas grabadas por GrabadorEstadisticas como arrays de sólo lectura sobre numpy.memmap
+    # (sólo se leen del disco las partes a las que se accede)
+    return {c: np.load(os.path.join(directorio, f'{c}.npy'), mmap_mode='r') for c in COLUMNAS_GRABACION
+            if os.path.exists(os.path.join(directorio, f'{c}.npy'))}